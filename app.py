@@ -1,32 +1,282 @@
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context, url_for
 import PyPDF2
 import os
+from werkzeug.formparser import parse_form_data
+
+from asset_store import STREAM_CHUNK_SIZE, IncomingFile, pin_object
+from doc_cache import DocumentCache
+from extract_jobs import JobQueue, QueueFull
+from pdf_extract import extract_pages, iter_pages
+from pdf_pool import open_pdf
+from pdf_search import built_search_index, search_index
 
 app = Flask(__name__)
 
-def extract_text_from_pdf(pdf_path):
+# Largest accepted request body, uploads included
+app.config.setdefault('MAX_CONTENT_LENGTH', 512 << 20)
+
+# Extraction backend used when a request does not pick one: 'pymupdf' or 'pypdf2'
+app.config.setdefault('PDF_BACKEND', 'pymupdf')
+
+# Memory budget for extracted page texts kept between requests
+TEXT_CACHE_BYTES = 256 << 20
+
+# Page texts per (backend, path, mtime, size), least recently used evicted first
+text_cache = DocumentCache(max_bytes=TEXT_CACHE_BYTES)
+
+# Pages shown by /display when the request does not give a count, and the most it may ask for
+PAGES_PER_REQUEST = 20
+MAX_PAGES_PER_REQUEST = 200
+
+
+def extract_pages_pypdf2(pdf_path, progress=None, start=0, stop=None):
+    texts = []
     with open(pdf_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        for page in reader.pages[start:stop]:
+            texts.append(page.extract_text())
+            if progress:
+                progress(len(texts))
+    return tuple(texts)
+
+
+def extract_pages_pymupdf(pdf_path, progress=None, start=0, stop=None):
+    texts = []
+    # A whole document is sharded across processes; a slice is read in this one
+    if (start, stop) == (0, None):
+        pages = extract_pages(pdf_path, 'text')
+    else:
+        pages = iter_pages(pdf_path, 'text', start=start, stop=stop)
+    for _, text in pages:
+        texts.append(text)
+        if progress:
+            progress(len(texts))
+    return tuple(texts)
+
+
+EXTRACTORS = {
+    'pymupdf': extract_pages_pymupdf,
+    'pypdf2': extract_pages_pypdf2,
+}
+
+
+def extract_page_texts(pdf_path, backend=None, progress=None):
+    """Text of every page of a PDF, extracted once per version of the file.
+
+    progress(pages_done) is called as pages are extracted, unless the texts are already cached.
+    """
+    backend = backend or app.config['PDF_BACKEND']
+    extract = EXTRACTORS[backend]
+    return text_cache.get(f'pages_{backend}', pdf_path, lambda path: extract(path, progress))
+
+
+def extract_page_range(pdf_path, start, stop, backend=None):
+    """Texts of pages start..stop-1 (0-based), without extracting the rest of the PDF.
+
+    Served from the whole document's texts when those are cached, otherwise
+    extracted and cached as a range of their own.
+    """
+    backend = backend or app.config['PDF_BACKEND']
+    texts = text_cache.peek(f'pages_{backend}', pdf_path)
+    if texts is not None:
+        return texts[start:stop]
+    extract = EXTRACTORS[backend]
+    return text_cache.get(f'pages_{backend}_{start}_{stop}', pdf_path,
+                          lambda path: extract(path, start=start, stop=stop))
+
+
+def extract_text_from_pdf(pdf_path, backend=None):
+    return "".join(extract_page_texts(pdf_path, backend))
+
+
+def run_extraction_job(job):
+    """Extract a PDF's page texts and build its search index.
+
+    The texts become the job's result and also fill the text cache for
+    /display; the index is shared through the document cache.
+    """
+    pdf_path = job.params['pdf_path']
+    with open_pdf(pdf_path) as pdf:
+        job.progress(0, pdf.page_count)
+    texts = extract_page_texts(pdf_path, job.params['backend'], job.progress)
+    job.progress(len(texts))
+    search_index(pdf_path)
+    return texts
+
+
+def submit_extraction(pdf_path, backend, word=''):
+    """Queue an extraction job, or return the one already running for this PDF and backend."""
+    return jobs.submit(key=(os.path.abspath(pdf_path), backend),
+                       pdf_path=pdf_path, backend=backend, word=word)
+
+
+jobs = JobQueue(run_extraction_job)
+
+
+def page_range(page, count, page_count):
+    """Clamp a requested page and count; returns (count, last page) or None if page is out of range."""
+    count = max(1, min(count, MAX_PAGES_PER_REQUEST))
+    if not 1 <= page <= max(page_count, 1):
+        return None
+    return count, min(page + count - 1, page_count)
+
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/display', methods=['POST'])
+def stream_template(template_name, **context):
+    """Response that renders a template piece by piece as the client reads it."""
+    template = app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(**context)))
+
+@app.route('/display', methods=['GET', 'POST'])
 def display():
-    word = request.form['word']
-    pdf_path = request.form['pdf_path']
+    """Occurrences of the word in the PDF, then a range of its pages; format=json returns just the occurrences."""
+    word = request.values['word']
+    pdf_path = request.values['pdf_path']
+    backend = request.values.get('backend')
+    page = request.values.get('page', 1, type=int)
+    count = request.values.get('count', PAGES_PER_REQUEST, type=int)
 
     if not os.path.exists(pdf_path):
         return "PDF file not found!"
+    if backend and backend not in EXTRACTORS:
+        return f"Unknown backend: {backend}", 400
+
+    # The search index is built by a background job, never in the request;
+    # None hits mean it is not ready yet
+    index = built_search_index(pdf_path)
+    found = index.search(word) if index is not None else None
+    search_job = None
+    if found is None:
+        try:
+            search_job = submit_extraction(pdf_path, backend or app.config['PDF_BACKEND'], word)
+        except QueueFull:
+            pass
+
+    if request.values.get('format') == 'json':
+        if found is None:
+            status_url = search_job and url_for('job_status', job_id=search_job.id)
+            return jsonify(word=word, hits=None, status_url=status_url), 202
+        return jsonify(word=word, hits=list(found))
+
+    with open_pdf(pdf_path) as pdf:
+        page_count = pdf.page_count
+    clamped = page_range(page, count, page_count)
+    if clamped is None:
+        return f"Page {page} is out of range (1-{page_count})", 404
+    count, last = clamped
+
+    def link(to_page):
+        return url_for('display', word=word, pdf_path=pdf_path, backend=backend,
+                       page=to_page, count=count)
+
+    def hits():
+        for hit in found or ():
+            # The range of pages that starts at the hit's page
+            yield hit, f"{link(hit['page'])}#page-{hit['page']}"
+
+    def pages():
+        # Runs while streaming, so the page header goes out before any extraction
+        texts = extract_page_range(pdf_path, page - 1, last, backend)
+        yield from enumerate(texts, start=page)
+
+    return stream_template(
+        'display.html', word=word, hits=hits(), search_pending=found is None, pages=pages(),
+        first=page, last=last, page_count=page_count,
+        prev_url=link(max(1, page - count)) if page > 1 else None,
+        next_url=link(last + 1) if last < page_count else None)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    pdf_path = request.values['pdf_path']
+    word = request.values.get('word', '')
+    backend = request.values.get('backend') or app.config['PDF_BACKEND']
+
+    if not os.path.exists(pdf_path):
+        return jsonify(error="PDF file not found!"), 404
+    if backend not in EXTRACTORS:
+        return jsonify(error=f"Unknown backend: {backend}"), 400
+
+    try:
+        job = submit_extraction(pdf_path, backend, word)
+    except QueueFull as e:
+        return jsonify(error=str(e)), 503, {'Retry-After': '5'}
+    status_url = url_for('job_status', job_id=job.id)
+    return jsonify(id=job.id, status_url=status_url), 202, {'Location': status_url}
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Job progress; once done, also the text of pages page..page+count-1."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error=f"Unknown job: {job_id}"), 404
+
+    result = job.to_dict()
+    if job.status == 'done':
+        pdf_path = job.params['pdf_path']
+        backend = job.params['backend']
+        page = request.args.get('page', 1, type=int)
+        count = request.args.get('count', PAGES_PER_REQUEST, type=int)
+        texts = job.result
+        clamped = page_range(page, count, len(texts))
+        if clamped is None:
+            return jsonify(error=f"Page {page} is out of range (1-{len(texts)})"), 404
+        count, last = clamped
+        result['pages'] = [{'page': n, 'text': texts[n - 1]} for n in range(page, last + 1)]
+        result['display_url'] = url_for('display', pdf_path=pdf_path, backend=backend,
+                                        word=job.params.get('word', ''))
+    return jsonify(result)
+
+@app.route('/upload', methods=['POST'])
+def upload():
+    """Store a PDF sent as the raw request body or as the 'pdf' field of a multipart form.
+
+    The body is streamed straight into the asset store's incoming directory,
+    hashed as it is written; form parts go there through the parser's stream
+    factory rather than a spooled temporary file. Content the server already
+    holds is not stored again and its cached extraction is reused; new content
+    gets a background extraction job. The returned path is pinned: the store's
+    garbage collection leaves it in place until the pin expires, and each
+    upload of the same content renews it.
+    """
+    incoming = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        incoming.append(IncomingFile())
+        return incoming[-1]
+
+    try:
+        if request.mimetype == 'multipart/form-data':
+            _, _, files = parse_form_data(request.environ, stream_factory=stream_factory,
+                                          max_content_length=app.config['MAX_CONTENT_LENGTH'])
+            if 'pdf' not in files:
+                return jsonify(error="No 'pdf' file in the form"), 400
+            upload_file = files['pdf'].stream
+        else:
+            upload_file = stream_factory(request.content_length, request.mimetype, None)
+            for chunk in iter(lambda: request.stream.read(STREAM_CHUNK_SIZE), b''):
+                upload_file.write(chunk)
 
-    pdf_text = extract_text_from_pdf(pdf_path)
+        if not upload_file.head.startswith(b'%PDF-'):
+            return jsonify(error="Not a PDF file"), 400
+        digest, object_path, created = upload_file.commit('.pdf')
+    finally:
+        for f in incoming:
+            f.discard()
 
-    return render_template('display.html', word=word, pdf_text=pdf_text)
+    pdf_path = pin_object(object_path)
+    result = {'sha256': digest, 'pdf_path': pdf_path, 'already_stored': not created}
+    if created:
+        try:
+            job = submit_extraction(pdf_path, app.config['PDF_BACKEND'])
+            result['job_id'] = job.id
+            result['status_url'] = url_for('job_status', job_id=job.id)
+        except QueueFull:
+            # Extraction will happen on first display instead
+            pass
+    return jsonify(result), 201 if created else 200
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from word_index import remember_sha256, sha256_file
+
+# Layout: objects/<sha[:2]>/<sha><ext> holds one copy of each file's content;
+# viewers/<random>/ holds generated pages, with assets linked in from objects;
+# pinned/<sha><ext> links objects whose paths were handed out, keeping them until the pin expires
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), 'pdf_linker', 'assets')
+
+# Viewer directories are only needed while a page is open
+DEFAULT_VIEWER_MAX_AGE = 24 * 3600
+DEFAULT_OBJECT_MAX_AGE = 7 * 24 * 3600
+
+# Pins not renewed by pin_object for this long are removed, releasing their objects
+DEFAULT_PIN_MAX_AGE = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 4 << 30
+
+# Streamed content is written to incoming/ first, then renamed into objects/
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Leading bytes of incoming content kept for type checks
+HEAD_SIZE = 16
+
+# Linux ioctl that makes dst a copy-on-write clone of src (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    """Clone src to dst without copying data; returns False where unsupported."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _clone_or_copy(src, dst):
+    if not _reflink(src, dst):
+        shutil.copyfile(src, dst)
+
+
+def _touch(path):
+    """Mark an object as recently used for garbage collection.
+
+    Only the access time changes, so caches keyed by (path, mtime, size)
+    keep hitting.
+    """
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+
+def store_file(path, store_dir=DEFAULT_STORE_DIR):
+    """Add a file to the store, once per content, and return the stored path.
+
+    The stored object is a reflink or copy, never a hardlink to the source,
+    so later edits to the source cannot change stored content.
+    """
+    digest = sha256_file(path)
+    ext = os.path.splitext(path)[1].lower()
+    object_dir = os.path.join(store_dir, 'objects', digest[:2])
+    object_path = os.path.join(object_dir, digest + ext)
+
+    if os.path.exists(object_path):
+        _touch(object_path)
+        return object_path
+
+    os.makedirs(object_dir, exist_ok=True)
+    tmp_path = f"{object_path}.{os.getpid()}.tmp"
+    _clone_or_copy(path, tmp_path)
+    os.replace(tmp_path, object_path)
+    collect_garbage(store_dir, keep=object_path)
+    return object_path
+
+
+class IncomingFile:
+    """File in the store's incoming/ directory that hashes content as it is written.
+
+    commit() moves it into objects/, or drops it if the store already holds
+    the content; discard() deletes it. It is seekable, so it can back a
+    streaming form parser, but writes must be sequential.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        incoming_dir = os.path.join(store_dir, 'incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(suffix='.tmp', dir=incoming_dir)
+        self.file = os.fdopen(fd, 'w+b')
+        self.head = b''
+        self.size = 0
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        if self.file.tell() != self.size:
+            raise ValueError("IncomingFile only supports sequential writes")
+        if len(self.head) < HEAD_SIZE:
+            self.head += bytes(data[:HEAD_SIZE - len(self.head)])
+        self._hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def commit(self, ext=''):
+        """Move the content into the store; returns (sha256, object path, created)."""
+        self.file.close()
+        digest = self._hash.hexdigest()
+        object_dir = os.path.join(self.store_dir, 'objects', digest[:2])
+        object_path = os.path.join(object_dir, digest + ext.lower())
+
+        if os.path.exists(object_path):
+            self.discard()
+            _touch(object_path)
+            created = False
+        else:
+            os.makedirs(object_dir, exist_ok=True)
+            os.replace(self.path, object_path)
+            created = True
+        self.path = None
+
+        remember_sha256(object_path, digest)
+        if created:
+            collect_garbage(self.store_dir, keep=object_path)
+        return digest, object_path, created
+
+    def discard(self):
+        """Delete the content if it was not committed."""
+        self.file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+
+def pin_object(object_path, store_dir=DEFAULT_STORE_DIR):
+    """Return a path to a stored object that garbage collection keeps until the pin expires.
+
+    The pin is a hardlink under pinned/ (a copy where links are unsupported).
+    Pinning the same object again renews the pin; once it expires, garbage
+    collection deletes it and the object is collected like any other.
+    """
+    pinned_dir = os.path.join(store_dir, 'pinned')
+    os.makedirs(pinned_dir, exist_ok=True)
+    pinned_path = os.path.join(pinned_dir, os.path.basename(object_path))
+    if not os.path.exists(pinned_path):
+        try:
+            os.link(object_path, pinned_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            _clone_or_copy(object_path, pinned_path)
+    # The pin's age is its access time, which a hardlink shares with the object
+    _touch(pinned_path)
+    # Object names are their SHA-256, so the pin need not be hashed again
+    remember_sha256(pinned_path, os.path.splitext(os.path.basename(object_path))[0])
+    return pinned_path
+
+
+def place_file(path, dest, store_dir=DEFAULT_STORE_DIR):
+    """Put a file's content at dest: hardlinked from the store, else reflinked, else copied."""
+    object_path = store_file(path, store_dir)
+    try:
+        os.link(object_path, dest)
+    except OSError:
+        # Other filesystem, or no hardlink support
+        _clone_or_copy(object_path, dest)
+    return dest
+
+
+def new_viewer_dir(store_dir=DEFAULT_STORE_DIR):
+    """Create a fresh directory for a generated viewer page."""
+    viewers_dir = os.path.join(store_dir, 'viewers')
+    os.makedirs(viewers_dir, exist_ok=True)
+    collect_garbage(store_dir)
+    return tempfile.mkdtemp(dir=viewers_dir)
+
+
+def collect_garbage(store_dir=DEFAULT_STORE_DIR, viewer_max_age=DEFAULT_VIEWER_MAX_AGE,
+                    object_max_age=DEFAULT_OBJECT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES, keep=None,
+                    pin_max_age=DEFAULT_PIN_MAX_AGE):
+    """Delete old viewer directories and expired pins, then objects by age and least recent use.
+
+    Recent use is the access time set by _touch. Objects still hardlinked
+    from a live viewer directory or an unexpired pin are kept, since their
+    paths may be in use.
+    """
+    now = time.time()
+
+    pinned_dir = os.path.join(store_dir, 'pinned')
+    if os.path.isdir(pinned_dir):
+        for name in os.listdir(pinned_dir):
+            path = os.path.join(pinned_dir, name)
+            try:
+                if now - os.stat(path).st_atime > pin_max_age:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    viewers_dir = os.path.join(store_dir, 'viewers')
+    if os.path.isdir(viewers_dir):
+        for name in os.listdir(viewers_dir):
+            path = os.path.join(viewers_dir, name)
+            try:
+                if now - os.stat(path).st_mtime > viewer_max_age:
+                    shutil.rmtree(path)
+            except OSError:
+                # Still open in a browser on Windows; try again next time
+                continue
+
+    entries = []
+    objects_dir = os.path.join(store_dir, 'objects')
+    if os.path.isdir(objects_dir):
+        for prefix in os.listdir(objects_dir):
+            prefix_dir = os.path.join(objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, stat.st_nlink, path))
+
+    total = sum(size for _, size, _, _ in entries)
+    for used, size, links, path in sorted(entries):
+        if total <= max_bytes and now - used <= object_max_age:
+            break
+        if path == keep or links > 1:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
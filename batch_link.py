@@ -0,0 +1,234 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pdf_extract
+from main import WordPdfLinker
+from pdf_highlights import compute_page_highlights
+from word_index import sha256_file
+
+MANIFEST_NAME = 'manifest.json'
+MISMATCH_SUFFIXES = ('_mismatches.json', '_mismatches.jsonl', '.json', '.jsonl')
+
+
+def find_jobs_in_directory(directory):
+    """Pair each X.docx in a directory with X.pdf and, if present, its mismatches file."""
+    jobs = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() != '.docx' or name.startswith('~$') or stem.endswith('_linked'):
+            continue
+        pdf_path = os.path.join(directory, stem + '.pdf')
+        if not os.path.exists(pdf_path):
+            print(f"Skipping {name}: no {stem}.pdf")
+            continue
+        mismatches_path = None
+        for suffix in MISMATCH_SUFFIXES:
+            candidate = os.path.join(directory, stem + suffix)
+            if os.path.exists(candidate):
+                mismatches_path = candidate
+                break
+        jobs.append({
+            'docx': os.path.join(directory, name),
+            'pdf': pdf_path,
+            'mismatches': mismatches_path,
+        })
+    return jobs
+
+
+def read_jobs_from_csv(csv_path):
+    """Read (docx, pdf, mismatches) rows; paths are relative to the CSV, mismatches optional."""
+    base = os.path.dirname(os.path.abspath(csv_path))
+    jobs = []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            mismatches = (row.get('mismatches') or '').strip()
+            jobs.append({
+                'docx': os.path.join(base, row['docx'].strip()),
+                'pdf': os.path.join(base, row['pdf'].strip()),
+                'mismatches': os.path.join(base, mismatches) if mismatches else None,
+            })
+    return jobs
+
+
+def load_manifest(manifest_path):
+    """Load the manifest of completed jobs, keyed by absolute docx path."""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"Ignoring unreadable manifest {manifest_path}")
+        return {}
+
+
+def save_manifest(manifest, manifest_path):
+    """Write the manifest atomically, so a crash never leaves it half written."""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def fingerprint(path, previous=None):
+    """Size, mtime and SHA-256 of an input; the hash is reused if size and mtime are unchanged."""
+    if path is None:
+        return None
+    stat = os.stat(path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        return previous
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256_file(path)}
+
+
+def input_fingerprints(job, previous_entry=None):
+    """Fingerprint a job's inputs, reusing hashes from its previous manifest entry."""
+    previous = (previous_entry or {}).get('inputs', {})
+    return {
+        key: fingerprint(job[key], previous.get(key))
+        for key in ('docx', 'pdf', 'mismatches')
+    }
+
+
+def same_inputs(a, b):
+    """Compare input fingerprints by content hash only."""
+    def hashes(inputs):
+        return {key: value and value['sha256'] for key, value in inputs.items()}
+    return hashes(a) == hashes(b)
+
+
+def assign_output_stems(jobs):
+    """Drop repeated docx paths and give each job the stem its outputs are named by.
+
+    Outputs share one directory, so docx files with the same base name from
+    different directories get a short hash of their path appended instead of
+    overwriting each other.
+    """
+    unique = {}
+    for job in jobs:
+        key = os.path.abspath(job['docx'])
+        if key in unique:
+            print(f"Skipping duplicate job for {job['docx']}")
+            continue
+        unique[key] = job
+
+    by_stem = {}
+    for key in unique:
+        stem = os.path.splitext(os.path.basename(key))[0]
+        by_stem.setdefault(stem.casefold(), []).append(key)
+    for key, job in unique.items():
+        stem = os.path.splitext(os.path.basename(key))[0]
+        if len(by_stem[stem.casefold()]) > 1:
+            stem += '_' + hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]
+        job['output_stem'] = stem
+    return list(unique.values())
+
+
+def _init_worker():
+    # Each batch worker already has a core; don't fan out page extraction again
+    pdf_extract.MAX_WORKERS = 1
+
+
+def process_job(job, output_dir):
+    """Highlight the docx and write the viewer for one triple; returns the output paths."""
+    stem = job['output_stem']
+    linker = WordPdfLinker()
+    linker.word_path = job['docx']
+    linker.pdf_path = job['pdf']
+
+    outputs = {}
+    if job['mismatches']:
+        if not linker.load_mismatches(job['mismatches']):
+            raise RuntimeError(f"Could not load {job['mismatches']}")
+    else:
+        outputs['mismatches'] = os.path.join(output_dir, stem + '_mismatches.json')
+        if not linker.detect_mismatches(outputs['mismatches']):
+            raise RuntimeError(f"Could not detect mismatches for {job['docx']}")
+
+    outputs['docx'] = linker.highlight_word_document(
+        os.path.join(output_dir, stem + '_linked.docx'), streaming=True)
+    if not outputs['docx']:
+        raise RuntimeError(f"Could not highlight {job['docx']}")
+
+    # The viewer refers to the PDF where it is instead of copying it
+    outputs['viewer'] = os.path.join(output_dir, stem + '_viewer.html')
+    highlights = compute_page_highlights(linker.pdf_path, linker.mismatches)
+    pdf_url = os.path.relpath(os.path.abspath(job['pdf']), output_dir).replace(os.sep, '/')
+    with open(outputs['viewer'], 'w', encoding='utf-8') as f:
+        linker.write_viewer_html(f, pdf_url, highlights)
+    return outputs
+
+
+def run_batch(jobs, output_dir, workers=None, force=False):
+    """Process jobs with a bounded process pool, skipping those already in the manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    output_dir = os.path.abspath(output_dir)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    jobs = assign_output_stems(jobs)
+
+    todo = []
+    for job in jobs:
+        key = os.path.abspath(job['docx'])
+        entry = manifest.get(key)
+        inputs = input_fingerprints(job, entry)
+        if not force and entry and same_inputs(entry['inputs'], inputs) \
+                and all(os.path.exists(path) for path in entry['outputs'].values()):
+            print(f"Up to date: {job['docx']}")
+            # Keep the refreshed mtimes, so unchanged content is not rehashed next time
+            entry['inputs'] = inputs
+            continue
+        todo.append((key, job, inputs))
+    save_manifest(manifest, manifest_path)
+
+    failed = 0
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker) as pool:
+            futures = {pool.submit(process_job, job, output_dir): (key, job, inputs) for key, job, inputs in todo}
+            for future in as_completed(futures):
+                key, job, inputs = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed: {job['docx']}: {e}")
+                    continue
+                # Record each completion right away, so a rerun after a crash resumes here
+                manifest[key] = {'inputs': inputs, 'outputs': outputs, 'completed_at': time.time()}
+                save_manifest(manifest, manifest_path)
+                print(f"Done: {job['docx']} -> {outputs['docx']}")
+
+    print(f"{len(todo) - failed} processed, {len(jobs) - len(todo)} skipped, {failed} failed")
+    return failed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link Word/PDF pairs in bulk without the GUI.")
+    parser.add_argument('input', help="directory of X.docx / X.pdf [/ X_mismatches.json] files, "
+                                      "or a CSV with docx,pdf,mismatches columns")
+    parser.add_argument('-o', '--output-dir', help="where to write outputs and the manifest "
+                                                   "(default: <input dir>/linked)")
+    parser.add_argument('-j', '--workers', type=int, help="parallel jobs (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="reprocess jobs already in the manifest")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        jobs = find_jobs_in_directory(args.input)
+        base_dir = args.input
+    else:
+        jobs = read_jobs_from_csv(args.input)
+        base_dir = os.path.dirname(os.path.abspath(args.input))
+
+    output_dir = args.output_dir or os.path.join(base_dir, 'linked')
+    ok = run_batch(jobs, output_dir, args.workers, args.force)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
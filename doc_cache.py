@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import docx
+import PyPDF2
+
+# Approximate memory budget for everything held in the cache
+DEFAULT_MAX_BYTES = 512 << 20
+
+# A parsed document takes several times its file size in memory
+PARSED_SIZE_FACTOR = 8
+
+
+def file_key(path):
+    """Identity of a file's current contents: (absolute path, mtime, size)."""
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def estimate_size(value, file_size):
+    """Rough memory footprint of a cached value, in bytes."""
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return file_size * PARSED_SIZE_FACTOR
+
+
+class DocumentCache:
+    """Process-wide LRU of parsed documents and values derived from them.
+
+    Entries are keyed by (kind, path, mtime, size), so an edited file misses
+    the cache instead of returning stale content, and the least recently used
+    entries are dropped once the estimated total exceeds max_bytes. Values
+    that hold resources pass on_drop, which is called with the value, outside
+    the lock, whenever the cache lets go of it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, path, load, on_drop=None):
+        """Return load(path), computing it only if this version of the file is not cached."""
+        path, mtime_ns, size = file_key(path)
+        key = (kind, path, mtime_ns, size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        # Load outside the lock; derived values look up their source document here too
+        value = load(path)
+        weight = estimate_size(value, size)
+
+        dropped = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another thread loaded it meanwhile
+                dropped.append((value, weight, on_drop))
+                value = entry[0]
+            else:
+                # Older versions of the same file will never be hit again
+                for stale in [k for k in self._entries if k[:2] == (kind, path)]:
+                    dropped.append(self._entries.pop(stale))
+
+                self._entries[key] = (value, weight, on_drop)
+                self.total_bytes += weight
+                while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                    dropped.append(self._entries.popitem(last=False)[1])
+                self.total_bytes -= sum(entry[1] for entry in dropped)
+        self._drop(dropped)
+        return value
+
+    @staticmethod
+    def _drop(entries):
+        for value, _, on_drop in entries:
+            if on_drop is not None:
+                on_drop(value)
+
+    def peek(self, kind, path):
+        """The cached value for the current version of path, or None; never loads."""
+        path, mtime_ns, size = file_key(path)
+        key = (kind, path, mtime_ns, size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            dropped = list(self._entries.values())
+            self._entries.clear()
+            self.total_bytes = 0
+        self._drop(dropped)
+
+
+cache = DocumentCache()
+
+
+def cached(kind, path, load, on_drop=None):
+    """Return load(path) through the shared cache, under a caller-chosen kind."""
+    return cache.get(kind, path, load, on_drop)
+
+
+def word_document(path):
+    """Parsed docx.Document for a file; shared, so callers must not modify it."""
+    return cache.get('docx', path, docx.Document)
+
+
+def word_paragraphs(path):
+    """Texts of every paragraph of a docx, in document order."""
+    return cache.get('docx_paragraphs', path,
+                     lambda p: tuple(para.text for para in word_document(p).paragraphs))
+
+
+def pdf_reader(path):
+    """Parsed PyPDF2.PdfReader for a file, read into memory; shared, so use it from one thread at a time.
+
+    PyMuPDF documents are shared through pdf_pool instead, which checks each
+    one out to a single thread.
+    """
+    return cache.get('pypdf2', path, PyPDF2.PdfReader)
+
+
+def pdf_page_texts(path):
+    """PyPDF2 text of every page of a PDF, in page order."""
+    return cache.get('pypdf2_pages', path,
+                     lambda p: tuple(page.extract_text() for page in pdf_reader(p).pages))
@@ -0,0 +1,392 @@
+import copy
+import os
+import struct
+import zipfile
+from bisect import bisect_right
+
+from docx.opc.packuri import PACKAGE_URI
+from docx.opc.part import XmlPart
+from lxml import etree
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+DOCUMENT_PART = 'word/document.xml'
+CONTENT_TYPES_PART = '[Content_Types].xml'
+
+COPY_CHUNK_SIZE = 1 << 20
+
+# Zip local file header layout
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+LOCAL_HEADER_SIZE = 30
+DATA_DESCRIPTOR_FLAG = 0x08
+ZIP64_EXTRA_ID = 0x0001
+
+
+def w(tag):
+    """Return the Clark-notation name of a WordprocessingML tag."""
+    return f'{{{W_NS}}}{tag}'
+
+
+W_BODY = w('body')
+W_P = w('p')
+W_R = w('r')
+W_RPR = w('rPr')
+W_T = w('t')
+W_TAB = w('tab')
+W_BR = w('br')
+W_CR = w('cr')
+W_NO_BREAK_HYPHEN = w('noBreakHyphen')
+W_PTAB = w('ptab')
+W_TYPE = w('type')
+
+# Text of the run content elements python-docx's run.text counts, besides w:t and w:br
+CONTENT_TEXT = {
+    W_TAB: '\t',
+    W_PTAB: '\t',
+    W_CR: '\n',
+    W_NO_BREAK_HYPHEN: '-',
+}
+
+
+def bucket_by_run(run_texts, mismatches):
+    """Assign mismatches to the run containing their paragraph offset.
+
+    Returns (run_starts, hits_by_run) where run_starts are the prefix offsets of
+    the runs and hits_by_run maps a run index to its mismatches in offset order.
+    """
+    run_starts = []
+    current_offset = 0
+    for text in run_texts:
+        run_starts.append(current_offset)
+        current_offset += len(text)
+
+    hits_by_run = {}
+    for mismatch in sorted(mismatches, key=lambda m: m.offset):
+        offset = mismatch.offset
+        if not 0 <= offset < current_offset:
+            continue
+        run_idx = bisect_right(run_starts, offset) - 1
+        hits_by_run.setdefault(run_idx, []).append(mismatch)
+    return run_starts, hits_by_run
+
+
+def split_run_text(text, run_start, hits):
+    """Cut a run's text into (segment_text, mismatch_or_None) pieces in document order."""
+    segments = []
+    cursor = 0
+    for mismatch in hits:
+        start = mismatch.offset - run_start
+        if start < cursor:
+            # Overlaps the previous mismatch in this run
+            continue
+        end = min(start + len(mismatch.text), len(text))
+        if start > cursor:
+            segments.append((text[cursor:start], None))
+        segments.append((text[start:end], mismatch))
+        cursor = end
+    if cursor < len(text):
+        segments.append((text[cursor:], None))
+    return segments
+
+
+def content_text(child):
+    """Text of one child of a w:r, following python-docx's CT_R.text.
+
+    Page and column breaks count as '', only text-wrapping breaks as '\n';
+    elements python-docx ignores (drawings, field codes, w:rPr) count as ''.
+    """
+    if child.tag == W_T:
+        return child.text or ''
+    if child.tag == W_BR:
+        return '\n' if child.get(W_TYPE, 'textWrapping') == 'textWrapping' else ''
+    return CONTENT_TEXT.get(child.tag, '')
+
+
+def run_text(r):
+    """Return the text of a w:r element the way python-docx reports it."""
+    return ''.join(content_text(child) for child in r)
+
+
+def set_run_range(r, source, start, end, last=False):
+    """Replace the content of w:r r (keeping its w:rPr) with characters start..end of run source.
+
+    w:t text is cut at the range ends; breaks, hyphens, tabs and elements
+    without text (page breaks, drawings, field codes) are copied whole into the
+    range they sit in, the last range also taking those at the very end.
+    """
+    for child in list(r):
+        if child.tag != W_RPR:
+            r.remove(child)
+
+    pos = 0
+    for child in source:
+        if child.tag == W_RPR:
+            continue
+        text = content_text(child)
+        child_end = pos + len(text)
+        if child.tag == W_T and text:
+            piece = text[max(start, pos) - pos:min(end, child_end) - pos]
+            if piece:
+                t = etree.SubElement(r, W_T)
+                t.text = piece
+                if piece != piece.strip():
+                    t.set(f'{{{XML_NS}}}space', 'preserve')
+        elif start <= pos < end or (last and pos == end):
+            r.append(copy.deepcopy(child))
+        pos = child_end
+
+
+def highlight_run(r, mismatch):
+    """Add the highlight, bookmark and hyperlink markup used by WordPdfLinker."""
+    rPr = r.find(W_RPR)
+    if rPr is None:
+        rPr = etree.Element(W_RPR)
+        r.insert(0, rPr)
+    highlight = rPr.find(w('highlight'))
+    if highlight is None:
+        highlight = etree.SubElement(rPr, w('highlight'))
+    highlight.set(w('val'), 'yellow')
+
+    # Bookmark
+    bookmark_start = etree.SubElement(r, w('bookmarkStart'))
+    bookmark_start.set(w('id'), '0')
+    bookmark_start.set(w('name'), mismatch.id)
+    bookmark_end = etree.SubElement(r, w('bookmarkEnd'))
+    bookmark_end.set(w('id'), '0')
+
+    # Hyperlink style
+    rStyle = etree.SubElement(r, w('rStyle'))
+    rStyle.set(w('val'), 'Hyperlink')
+    custom_xml = etree.SubElement(r, w('customXml'))
+    custom_xml.set(w('uri'), 'link')
+    custom_xml.set(w('element'), 'http://schemas.microsoft.com/office/word/2010/wordml')
+    custom_prop = etree.SubElement(custom_xml, w('attr'))
+    custom_prop.set(w('name'), 'target')
+    custom_prop.set(w('val'), f"mismatch:{mismatch.id}")
+
+
+def highlight_paragraph_element(p, mismatches):
+    """Split the w:r children of a w:p around its mismatches in a single pass."""
+    runs = [child for child in p if child.tag == W_R]
+    texts = [run_text(r) for r in runs]
+    run_starts, hits_by_run = bucket_by_run(texts, mismatches)
+
+    for run_idx, hits in hits_by_run.items():
+        r = runs[run_idx]
+        segments = split_run_text(texts[run_idx], run_starts[run_idx], hits)
+
+        template = copy.deepcopy(r)
+        previous = r
+        start = 0
+        for seg_idx, (segment_text, mismatch) in enumerate(segments):
+            if seg_idx == 0:
+                target = r
+            else:
+                target = copy.deepcopy(template)
+                previous.addnext(target)
+            end = start + len(segment_text)
+            set_run_range(target, template, start, end, last=seg_idx == len(segments) - 1)
+            if mismatch is not None:
+                highlight_run(target, mismatch)
+            previous = target
+            start = end
+
+
+def _open_tag(elem):
+    """Serialize the start tag of an element, with its attributes and namespaces."""
+    shell = etree.Element(elem.tag, dict(elem.attrib), nsmap=elem.nsmap)
+    xml = etree.tostring(shell)
+    return xml[:-2] + b'>'
+
+
+def _close_tag(elem):
+    """Serialize the end tag of an element."""
+    name = etree.QName(elem).localname
+    if elem.prefix:
+        name = f'{elem.prefix}:{name}'
+    return f'</{name}>'.encode('utf-8')
+
+
+def _namespace_decls(nsmap):
+    """Return the xmlns declarations lxml writes for a namespace map."""
+    decls = []
+    for prefix, uri in nsmap.items():
+        attr = f'xmlns:{prefix}' if prefix else 'xmlns'
+        decls.append(f' {attr}="{uri}"'.encode('utf-8'))
+    return decls
+
+
+def _strip_decls(xml, inherited_decls):
+    """Drop namespace declarations already made on the root from an element's start tag."""
+    tag_end = xml.index(b'>')
+    head = xml[:tag_end]
+    for decl in inherited_decls:
+        head = head.replace(decl, b'', 1)
+    return head + xml[tag_end:]
+
+
+def _serialize_child(elem, inherited_decls):
+    """Serialize a body-level element without re-declaring the root namespaces."""
+    xml = etree.tostring(elem, encoding='UTF-8', xml_declaration=False, with_tail=False)
+    return _strip_decls(xml, inherited_decls)
+
+
+def rewrite_document_xml(src, dst, mismatches, check_cancelled=None):
+    """Stream document.xml from src to dst, highlighting mismatches paragraph by paragraph.
+
+    Only one body-level element is held in memory at a time. Paragraphs are
+    counted the way python-docx's Document.paragraphs counts them (direct
+    w:p children of w:body). check_cancelled(), if given, is called before
+    each paragraph and may raise to stop.
+    """
+    depth = 0
+    para_idx = 0
+    root = None
+    inherited_decls = []
+    open_elements = []
+
+    dst.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+    for event, elem in etree.iterparse(src, events=('start', 'end'), huge_tree=True):
+        if event == 'start':
+            depth += 1
+            if depth == 1 or (depth == 2 and elem.tag == W_BODY):
+                if root is None:
+                    root = elem
+                    inherited_decls = _namespace_decls(elem.nsmap)
+                    dst.write(_open_tag(elem))
+                else:
+                    dst.write(_strip_decls(_open_tag(elem), inherited_decls))
+                open_elements.append(elem)
+            continue
+
+        depth -= 1
+        if open_elements and elem is open_elements[-1]:
+            # Closing w:body or the root
+            dst.write(_close_tag(elem))
+            open_elements.pop()
+            continue
+
+        parent_is_open = depth == len(open_elements)
+        if not parent_is_open:
+            continue
+
+        if elem.tag == W_P and depth == 2:
+            if check_cancelled:
+                check_cancelled()
+            para_mismatches = mismatches.by_paragraph(para_idx)
+            if para_mismatches:
+                highlight_paragraph_element(elem, para_mismatches)
+            para_idx += 1
+
+        dst.write(_serialize_child(elem, inherited_decls))
+
+        # Free the element and anything already written before it
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def _strip_zip64_extra(extra):
+    """Remove the zip64 extra field, which FileHeader adds back when needed."""
+    kept = []
+    pos = 0
+    while pos + 4 <= len(extra):
+        field_id, size = struct.unpack('<HH', extra[pos:pos + 4])
+        if field_id != ZIP64_EXTRA_ID:
+            kept.append(extra[pos:pos + 4 + size])
+        pos += 4 + size
+    return b''.join(kept)
+
+
+def copy_member_raw(zin, zout, info):
+    """Copy a zip member's compressed bytes from zin to zout without recompressing it."""
+    src = zin.fp
+    src.seek(info.header_offset)
+    header = src.read(LOCAL_HEADER_SIZE)
+    if header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    src.seek(info.header_offset + LOCAL_HEADER_SIZE + name_len + extra_len)
+
+    # Sizes and CRC are known up front, so no data descriptor is needed
+    out_info = copy.copy(info)
+    out_info.flag_bits &= ~DATA_DESCRIPTOR_FLAG
+    out_info.extra = _strip_zip64_extra(info.extra)
+    out_info.header_offset = zout.fp.tell()
+    zout.fp.write(out_info.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated data for {info.filename}")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zout.filelist.append(out_info)
+    zout.NameToInfo[out_info.filename] = out_info
+    zout.start_dir = zout.fp.tell()
+
+
+def save_changed_parts(doc, source_path, save_path):
+    """Save a python-docx Document, copying parts it cannot have changed as raw zip bytes.
+
+    XML parts and relationship items are re-serialized; binary parts such as
+    images, fonts and embeddings are copied from source_path without being
+    decompressed. Falls back to doc.save when parts were added, since that
+    needs a new [Content_Types].xml.
+    """
+    if os.path.abspath(source_path) == os.path.abspath(save_path):
+        doc.save(save_path)
+        return save_path
+
+    package = doc.part.package
+    parts = list(package.iter_parts())
+
+    with zipfile.ZipFile(source_path) as zin:
+        source_names = set(zin.namelist())
+        part_names = {part.partname.membername for part in parts}
+        if CONTENT_TYPES_PART not in source_names or not part_names <= source_names:
+            doc.save(save_path)
+            return save_path
+
+        rewritten = {PACKAGE_URI.rels_uri.membername: package.rels.xml}
+        for part in parts:
+            if isinstance(part, XmlPart):
+                rewritten[part.partname.membername] = part.blob
+            rels_name = part.partname.rels_uri.membername
+            if len(part.rels) or rels_name in source_names:
+                rewritten[rels_name] = part.rels.xml
+
+        with zipfile.ZipFile(save_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                blob = rewritten.pop(info.filename, None)
+                if blob is None:
+                    copy_member_raw(zin, zout, info)
+                else:
+                    zout.writestr(info.filename, blob)
+            # Relationship items that did not exist in the source
+            for name, blob in rewritten.items():
+                zout.writestr(name, blob)
+    return save_path
+
+
+def write_highlighted_docx(docx_path, output_path, mismatches, check_cancelled=None):
+    """Write a copy of a docx with mismatches highlighted, streaming document.xml.
+
+    Every other member is copied as raw compressed bytes. check_cancelled is
+    passed to rewrite_document_xml.
+    """
+    with zipfile.ZipFile(docx_path) as zin, \
+            zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            if info.filename != DOCUMENT_PART:
+                copy_member_raw(zin, zout, info)
+                continue
+            out_info = zipfile.ZipInfo(info.filename, info.date_time)
+            out_info.compress_type = zipfile.ZIP_DEFLATED
+            out_info.external_attr = info.external_attr
+            with zin.open(info) as src, zout.open(out_info, 'w', force_zip64=True) as dst:
+                rewrite_document_xml(src, dst, mismatches, check_cancelled)
+    return output_path
@@ -0,0 +1,116 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs running at once; each may itself fan out to extraction processes
+DEFAULT_MAX_WORKERS = 2
+
+# Queued plus running jobs; submissions beyond this are refused
+DEFAULT_MAX_ACTIVE = 16
+
+# Finished jobs, and their results, are forgotten after this long or beyond this many
+DEFAULT_KEEP_SECONDS = 3600
+DEFAULT_MAX_FINISHED = 32
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_active jobs are already queued or running."""
+
+
+class Job:
+    """State of one background job, updated by its worker and read by pollers."""
+
+    def __init__(self, params, key=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = 'queued'
+        self.pages_done = 0
+        self.page_count = None
+        self.error = None
+        self.result = None
+        self.finished_at = None
+
+    def progress(self, pages_done, page_count=None):
+        """Called by the worker as pages are extracted."""
+        self.pages_done = pages_done
+        if page_count is not None:
+            self.page_count = page_count
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'page_count': self.page_count,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """Run jobs on a bounded thread pool, with a cap on queued and running jobs.
+
+    run(job) does the work and reports progress through job.progress; its
+    return value is kept as job.result until the job is forgotten. A job's
+    status moves from 'queued' to 'running' to 'done' or 'error'.
+    """
+
+    def __init__(self, run, max_workers=DEFAULT_MAX_WORKERS, max_active=DEFAULT_MAX_ACTIVE,
+                 keep_seconds=DEFAULT_KEEP_SECONDS, max_finished=DEFAULT_MAX_FINISHED):
+        self.run = run
+        self.max_active = max_active
+        self.keep_seconds = keep_seconds
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract-job')
+        self._jobs = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, key=None, **params):
+        """Queue a job and return it; raises QueueFull if max_active jobs are pending.
+
+        If a queued or running job was submitted with the same key, that job is
+        returned instead of starting another.
+        """
+        with self._lock:
+            self._forget_finished()
+            if key is not None:
+                for job in self._jobs.values():
+                    if job.key == key and job.finished_at is None:
+                        return job
+            if self._active >= self.max_active:
+                raise QueueFull(f"{self._active} jobs are already queued or running")
+            job = Job(params, key)
+            self._jobs[job.id] = job
+            self._active += 1
+        self._executor.submit(self._work, job)
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self, job):
+        job.status = 'running'
+        try:
+            job.result = self.run(job)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'error'
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._active -= 1
+
+    def _forget_finished(self):
+        cutoff = time.monotonic() - self.keep_seconds
+        finished = sorted((job for job in self._jobs.values() if job.finished_at is not None),
+                          key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i < excess or job.finished_at < cutoff:
+                del self._jobs[job.id]
@@ -1,13 +1,18 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import docx
 import PyPDF2
 import os
 import webbrowser
-import tempfile
 from pathlib import Path
 import re
-import fitz  # PyMuPDF
+from word_index import open_word_index
+from doc_cache import word_paragraphs
+from asset_store import new_viewer_dir
+from term_index import TermIndex, link_paragraph_html
+from word_pane import word_pane_placeholders, word_pane_script, write_word_chunks
+
+# Write buffer for the generated viewer page
+HTML_WRITE_BUFFER = 1 << 16
 
 class DocumentLinker:
     def __init__(self, root):
@@ -21,6 +26,7 @@ class DocumentLinker:
         
         # Extracted content
         self.word_first_word = None
+        self.word_paragraphs = None
         self.pdf_second_page_first_word = None
         self.pdf_second_page_first_word_coords = None
         
@@ -94,8 +100,8 @@ class DocumentLinker:
     
     def extract_word_content(self):
         try:
-            doc = docx.Document(self.word_file_path)
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+            # Parsed once per file version and shared with the other extraction paths
+            paragraphs = [p for p in word_paragraphs(self.word_file_path) if p.strip()]
             
             if not paragraphs:
                 messagebox.showwarning("Warning", "No text found in Word document")
@@ -106,6 +112,7 @@ class DocumentLinker:
             first_word = first_paragraph.split()[0] if first_paragraph.split() else ""
             
             self.word_first_word = first_word
+            self.word_paragraphs = paragraphs
             self.word_first_word_label.config(text=first_word)
             
             return True
@@ -115,23 +122,14 @@ class DocumentLinker:
     
     def extract_pdf_content(self):
         try:
-            # Using PyMuPDF (fitz) to extract text and positions
-            pdf_document = fitz.open(self.pdf_file_path)
-            
-            if pdf_document.page_count < 2:
-                messagebox.showwarning("Warning", "PDF has fewer than 2 pages")
-                return False
-            
-            # Get second page
-            page = pdf_document[1]  # 0-based index, so 1 is the second page
-            page_text = page.get_text()
-            
-            if not page_text.strip():
-                messagebox.showwarning("Warning", "No text found on second page of PDF")
-                return False
-            
-            # Get first word from second page and its coordinates
-            words = page.get_text("words")  # List of (x0, y0, x1, y1, word, block_no, line_no, word_no)
+            # Word positions come from the cached, memory-mapped index of the PDF
+            with open_word_index(self.pdf_file_path) as word_index:
+                if word_index.page_count < 2:
+                    messagebox.showwarning("Warning", "PDF has fewer than 2 pages")
+                    return False
+                
+                # Get first word from second page and its coordinates
+                words = word_index.words(1)  # List of (x0, y0, x1, y1, word, block_no, line_no, word_no)
             
             if not words:
                 messagebox.showwarning("Warning", "No words found on second page of PDF")
@@ -173,24 +171,33 @@ class DocumentLinker:
             return
         
         try:
-            # Create a PDF.js-based HTML viewer
-            temp_dir = tempfile.gettempdir()
+            # Create a PDF.js-based HTML viewer in its own directory, next to its Word pane chunks
+            temp_dir = new_viewer_dir()
             html_path = os.path.join(temp_dir, "document_link_viewer.html")
             
             # Convert paths to absolute paths
             word_file_abs = os.path.abspath(self.word_file_path)
             pdf_file_abs = os.path.abspath(self.pdf_file_path)
             
-            # Get coordinates for highlighting
-            x0, y0, x1, y1 = self.pdf_second_page_first_word_coords
+            # Write the Word pane as chunk files, reusing the paragraphs parsed by extract_word_content;
+            # every word found in the PDF links to its matching occurrence there
+            with TermIndex(self.word_paragraphs, self.pdf_file_path) as index:
+                def link_attrs(pdf_word):
+                    page, x0, y0, x1, y1 = index.pdf_location(pdf_word)
+                    return f'data-page="{page}" data-box="{x0:.1f},{y0:.1f},{x1:.1f},{y1:.1f}"'
+                
+                chunks = write_word_chunks(
+                    temp_dir, self.word_paragraphs,
+                    lambda i, para: link_paragraph_html(para, index.paragraph_links(i), link_attrs))
             
             # Create HTML content with PDF.js for PDF viewing
-            html_content = f"""
+            header = f"""
             <!DOCTYPE html>
             <html>
             <head>
                 <title>Document Link Viewer</title>
                 <script src="https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.4.120/pdf.min.js"></script>
+                <script>{word_pane_script(chunks)}</script>
                 <style>
                     body {{ font-family: Arial, sans-serif; margin: 0; padding: 0; }}
                     .container {{ display: flex; height: 100vh; }}
@@ -216,23 +223,7 @@ class DocumentLinker:
                         <div id="word-content">
             """
             
-            # Add Word content with linked first word
-            doc = docx.Document(self.word_file_path)
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-            
-            for i, para in enumerate(paragraphs):
-                if i == 0 and self.word_first_word in para:
-                    # Link the first word
-                    linked_para = para.replace(
-                        self.word_first_word, 
-                        f'<span class="linked-word" onclick="goToPdfWord()">{self.word_first_word}</span>',
-                        1  # Replace only the first occurrence
-                    )
-                    html_content += f"<p>{linked_para}</p>"
-                else:
-                    html_content += f"<p>{para}</p>"
-            
-            html_content += """
+            footer = """
                         </div>
                     </div>
                     <div class="pdf-section">
@@ -307,9 +298,9 @@ class DocumentLinker:
                     };
                     
                     // Go to the PDF word and highlight it
-                    const goToPdfWord = async () => {
-                        // Go to page 2
-                        queueRenderPage(2);
+                    const goToPdfWord = async (pageNum, box) => {
+                        // Go to the word's page
+                        queueRenderPage(pageNum);
                         
                         // Add highlight
                         const overlay = document.getElementById('highlight-overlay');
@@ -321,22 +312,14 @@ class DocumentLinker:
                                 return;
                             }
                             
-                            // Get the scaling factor
-                            const viewport = pdfDoc.getPage(2).getViewport({ scale });
                             const canvas = document.querySelector('canvas');
                             
-                            // Calculate position for highlight based on PDF coordinates
-                            const x0 = """ + str(x0) + """ * scale;
-                            const y0 = """ + str(y0) + """ * scale;
-                            const x1 = """ + str(x1) + """ * scale;
-                            const y1 = """ + str(y1) + """ * scale;
-                            
-                            // Get canvas position
-                            const rect = canvas.getBoundingClientRect();
+                            // Calculate position for highlight; PyMuPDF word boxes are measured from the top-left
+                            const [x0, y0, x1, y1] = box.map(v => v * scale);
                             
                             // Position the highlight
                             overlay.style.left = (x0 + canvas.offsetLeft) + 'px';
-                            overlay.style.top = (viewport.height - y1 + canvas.offsetTop) + 'px';
+                            overlay.style.top = (y0 + canvas.offsetTop) + 'px';
                             overlay.style.width = (x1 - x0) + 'px';
                             overlay.style.height = (y1 - y0) + 'px';
                             overlay.style.display = 'block';
@@ -354,16 +337,29 @@ class DocumentLinker:
                     // Get reference to the container
                     const pdfContainer = document.getElementById('pdf-container');
                     
+                    // Every linked word carries its PDF page and box
+                    document.getElementById('word-content').addEventListener('click', (event) => {
+                        const link = event.target.closest('.linked-word');
+                        if (link) {
+                            goToPdfWord(Number(link.dataset.page), link.dataset.box.split(',').map(Number));
+                        }
+                    });
+                    
                     // Load the PDF when the page loads
                     loadPdf();
+                    
+                    // Start loading Word paragraphs as they come into view
+                    initWordPane();
                 </script>
             </body>
             </html>
             """
             
-            # Write to file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            # The Word pane is only placeholders; its paragraphs load in chunks as they scroll into view
+            with open(html_path, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER) as f:
+                f.write(header)
+                f.write(word_pane_placeholders(chunks))
+                f.write(footer)
             
             # Open in browser
             webbrowser.open('file://' + html_path)
@@ -1,13 +1,17 @@
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import docx
-import PyPDF2
 import os
 import webbrowser
 import tempfile
 from pathlib import Path
 import re
+import html
+from doc_cache import pdf_reader, word_paragraphs
+from term_index import TermIndex, link_paragraph_html
+
+# Write buffer for the generated page
+HTML_WRITE_BUFFER = 1 << 16
 
 class DocumentLinker:
     def __init__(self, root):
@@ -119,8 +123,8 @@ class DocumentLinker:
     
     def extract_word_content(self):
         try:
-            doc = docx.Document(self.word_file_path)
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+            # Parsed once per file version and shared with the other extraction paths
+            paragraphs = [p for p in word_paragraphs(self.word_file_path) if p.strip()]
             
             if not paragraphs:
                 messagebox.showwarning("Warning", "No text found in Word document")
@@ -145,7 +149,7 @@ class DocumentLinker:
     
     def extract_pdf_content(self):
         try:
-            reader = PyPDF2.PdfReader(self.pdf_file_path)
+            reader = pdf_reader(self.pdf_file_path)
             
             if len(reader.pages) < 2:
                 messagebox.showwarning("Warning", "PDF has fewer than 2 pages")
@@ -203,7 +207,7 @@ class DocumentLinker:
             html_path = os.path.join(temp_dir, "document_link.html")
             
             # Create HTML content with linking
-            html_content = f"""
+            header = f"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -218,69 +222,81 @@ class DocumentLinker:
                     .highlight {{ background-color: yellow; font-weight: bold; }}
                     .linked-word {{ color: blue; text-decoration: underline; cursor: pointer; }}
                 </style>
-                <script>
-                    function scrollToPdfWord() {{
-                        document.getElementById('pdf-target').scrollIntoView({{
-                            behavior: 'smooth'
-                        }});
-                    }}
-                </script>
             </head>
             <body>
                 <div class="container">
-                    <div class="word-section">
+                    <div class="word-section" id="word-content">
                         <h2>Word Document</h2>
-                        <p>
             """
             
-            # Add Word content with linked first word
-            doc = docx.Document(self.word_file_path)
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-            
-            for i, para in enumerate(paragraphs):
-                if i == 0 and self.word_first_word in para:
-                    # Link the first word
-                    linked_para = para.replace(
-                        self.word_first_word, 
-                        f'<span class="linked-word" onclick="scrollToPdfWord()">{self.word_first_word}</span>',
-                        1  # Replace only the first occurrence
-                    )
-                    html_content += linked_para + "</p><p>"
-                else:
-                    html_content += para + "</p><p>"
-            
-            html_content += """
-                        </p>
+            middle = """
                     </div>
                     <div class="pdf-section">
-                        <h2>PDF Document (Page 2)</h2>
-                        <p>
+                        <h2>PDF Document</h2>
             """
             
-            # Add PDF content with highlighted first word
-            pdf_text = self.pdf_second_page_text
-            if self.pdf_second_page_first_word in pdf_text:
-                # Highlight the first word
-                highlighted_text = pdf_text.replace(
-                    self.pdf_second_page_first_word,
-                    f'<span id="pdf-target" class="highlight">{self.pdf_second_page_first_word}</span>',
-                    1  # Replace only the first occurrence
-                )
-                html_content += highlighted_text.replace("\n", "<br>")
-            else:
-                html_content += pdf_text.replace("\n", "<br>")
-            
-            html_content += """
-                        </p>
+            footer = """
                     </div>
                 </div>
+                
+                <script>
+                    let currentTarget = null;
+                    
+                    // Scroll to a linked word's PDF occurrence and highlight it
+                    function scrollToPdfWord(targetId) {
+                        const target = document.getElementById(targetId);
+                        if (currentTarget) {
+                            currentTarget.classList.remove('highlight');
+                        }
+                        target.classList.add('highlight');
+                        currentTarget = target;
+                        target.scrollIntoView({
+                            behavior: 'smooth',
+                            block: 'center'
+                        });
+                    }
+                    
+                    document.getElementById('word-content').addEventListener('click', (event) => {
+                        const link = event.target.closest('.linked-word');
+                        if (link) {
+                            scrollToPdfWord(link.dataset.target);
+                        }
+                    });
+                </script>
             </body>
             </html>
             """
             
-            # Write to file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            paragraphs = [p for p in word_paragraphs(self.word_file_path) if p.strip()]
+            
+            # Link every Word word found in the PDF to its matching occurrence there
+            with TermIndex(paragraphs, self.pdf_file_path) as index, \
+                    open(html_path, 'w', encoding='utf-8', buffering=HTML_WRITE_BUFFER) as f:
+                targets = set()
+                
+                def link_attrs(pdf_word):
+                    targets.add(pdf_word)
+                    return f'data-target="w{pdf_word}"'
+                
+                f.write(header)
+                for i, para in enumerate(paragraphs):
+                    f.write(f"<p>{link_paragraph_html(para, index.paragraph_links(i), link_attrs)}</p>")
+                f.write(middle)
+                
+                # PDF text from the word index, a line break per text line, with ids on link targets
+                pdf = index.pdf
+                for page in range(pdf.page_count):
+                    f.write(f"<h3>Page {page + 1}</h3><p>")
+                    prev_line = None
+                    for i in range(pdf.page_offsets[page], pdf.page_offsets[page + 1]):
+                        line = (pdf.block[i], pdf.line[i])
+                        if prev_line is not None:
+                            f.write("<br>" if line != prev_line else " ")
+                        prev_line = line
+                        word = html.escape(pdf.string(pdf.string_id[i]))
+                        f.write(f'<span id="w{i}">{word}</span>' if i in targets else word)
+                    f.write("</p>")
+                f.write(footer)
             
             # Open in browser
             webbrowser.open('file://' + html_path)
@@ -1,121 +1,181 @@
 import os
 import sys
 import json
+import copy
 from docx import Document
+from docx.enum.text import WD_COLOR_INDEX
 from docx.shared import RGBColor
+from docx.text.run import Run
 from docx.oxml.shared import OxmlElement
 from docx.oxml.ns import qn
-import win32com.client
-import pythoncom
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from tkinter import ttk
+try:
+    import win32com.client
+    import pythoncom
+except ImportError:
+    # Word automation is only available on Windows; highlighting and viewers work without it
+    win32com = None
+    pythoncom = None
 import fitz  # PyMuPDF
-import tempfile
+import io
 import webbrowser
 import base64
 import re
+from pathlib import Path
+import queue
+import threading
+from collections import deque
+from mismatch_store import MismatchStore
+from mismatch_detect import DETECT_STAGES, detect_mismatches, write_mismatches
+from pdf_highlights import compute_page_highlights
+from viewer_server import ViewerServer
+from page_render import DEFAULT_ZOOM, ZOOM_LEVELS
+from asset_store import new_viewer_dir, place_file
+from docx_stream import bucket_by_run, save_changed_parts, split_run_text, write_highlighted_docx
+
+# Stages of the Process Documents pipeline, in order
+PIPELINE_STAGES = (
+    "Highlighting Word document",
+    "Creating PDF viewer",
+    "Setting up Word event handler",
+)
+
+# How often the GUI drains worker events and log output, and how much log it keeps
+UI_POLL_INTERVAL_MS = 100
+LOG_MAX_LINES = 5000
+LOG_MAX_PENDING_WRITES = 10000
+
+class PipelineCancelled(Exception):
+    """Raised by a check_cancelled callback to stop a running stage."""
 
 class WordPdfLinker:
     def __init__(self):
         self.word_path = None
         self.pdf_path = None
-        self.mismatches = []
+        self.mismatches = MismatchStore()
         self.temp_html = None
-        self.pdf_document = None
         self.word_document = None
+        self.viewer_server = None
+        # Held while the viewer is created, replaced or reset, from whichever thread does it
+        self.viewer_lock = threading.RLock()
+        self.word_app = None
+        self.word_doc = None
+        self.com_initialized = False
+        # Serve the viewer over local HTTP; False writes a standalone HTML file instead
+        self.use_viewer_server = True
         
     def load_mismatches(self, mismatches_json_path):
         """Load mismatches data from a JSON file."""
         try:
-            with open(mismatches_json_path, 'r') as f:
-                self.mismatches = json.load(f)
+            self.mismatches = MismatchStore.load(mismatches_json_path)
             print(f"Loaded {len(self.mismatches)} mismatches from {mismatches_json_path}")
             return True
         except Exception as e:
             print(f"Error loading mismatches: {e}")
             return False
     
-    def highlight_word_document(self, output_path=None):
-        """Highlight mismatched words in the Word document and add hyperlinks."""
+    def detect_mismatches(self, output_path=None, progress=None, check_cancelled=None):
+        """Detect formatting mismatches between the Word and PDF documents natively.
+        
+        progress and check_cancelled are passed to mismatch_detect.detect_mismatches;
+        check_cancelled may raise PipelineCancelled.
+        """
+        try:
+            mismatches, stats = detect_mismatches(self.word_path, self.pdf_path,
+                                                  progress=progress, check_cancelled=check_cancelled)
+            
+            self.mismatches = MismatchStore()
+            for mismatch in mismatches:
+                self.mismatches.add_dict(mismatch)
+            
+            if output_path:
+                write_mismatches(mismatches, output_path)
+                print(f"Saved mismatches to {output_path}")
+            
+            print(f"Detected {len(self.mismatches)} mismatches in {stats['aligned']} aligned words "
+                  f"({stats['tokens_per_second']:,.0f} tokens/s)")
+            return True
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            print(f"Error detecting mismatches: {e}")
+            return False
+    
+    def highlight_word_document(self, output_path=None, streaming=False, check_cancelled=None):
+        """Highlight mismatched words in the Word document and add hyperlinks.
+        
+        With streaming=True, word/document.xml is rewritten with lxml iterparse
+        instead of loading the document through python-docx, keeping memory flat
+        on very large files. check_cancelled(), if given, is called for each
+        paragraph and may raise PipelineCancelled.
+        """
+        save_path = output_path or self.word_path.replace('.docx', '_linked.docx')
         try:
+            if streaming:
+                write_highlighted_docx(self.word_path, save_path, self.mismatches, check_cancelled)
+                print(f"Saved highlighted document to {save_path}")
+                return save_path
+            
             # Load the Word document
             doc = Document(self.word_path)
             
-            # Create a unique ID for each mismatch
-            for i, mismatch in enumerate(self.mismatches):
-                mismatch['id'] = f"mismatch_{i}"
-            
-            # Process each paragraph in the document
+            # Process each paragraph that has mismatches
             for para_idx, para in enumerate(doc.paragraphs):
-                if not para.text.strip():
-                    continue
-                
-                # Find mismatches in this paragraph
-                para_mismatches = [m for m in self.mismatches 
-                                  if m['word_location']['paragraph'] == para_idx]
-                
-                if not para_mismatches:
-                    continue
-                
-                # Sort mismatches by their position (in reverse order to avoid invalidating indices)
-                para_mismatches.sort(key=lambda m: m['word_location']['offset'], reverse=True)
-                
-                # Create a new run for each mismatch
-                for mismatch in para_mismatches:
-                    word = mismatch['text']
-                    offset = mismatch['word_location']['offset']
-                    
-                    # Find the run containing the word
-                    current_offset = 0
-                    target_run_idx = None
-                    word_start_in_run = None
-                    
-                    for run_idx, run in enumerate(para.runs):
-                        if current_offset <= offset < current_offset + len(run.text):
-                            target_run_idx = run_idx
-                            word_start_in_run = offset - current_offset
-                            break
-                        current_offset += len(run.text)
-                    
-                    if target_run_idx is None:
-                        continue
-                    
-                    # Get the target run
-                    run = para.runs[target_run_idx]
-                    
-                    # Split the run text
-                    before_text = run.text[:word_start_in_run]
-                    word_text = run.text[word_start_in_run:word_start_in_run + len(word)]
-                    after_text = run.text[word_start_in_run + len(word):]
-                    
-                    # Update the run with the 'before' text
-                    run.text = before_text
-                    
-                    # Create a new run with the word text and apply highlighting
-                    new_run = para.add_run(word_text)
-                    new_run.font.highlight_color = WD_COLOR_INDEX.YELLOW
-                    
-                    # Add bookmark
-                    self.add_bookmark(new_run._element, mismatch['id'])
-                    
-                    # Add hyperlink behavior
-                    self.add_hyperlink_style(new_run._element, f"mismatch:{mismatch['id']}")
-                    
-                    # Add 'after' text in a new run
-                    if after_text:
-                        para.add_run(after_text)
+                if check_cancelled:
+                    check_cancelled()
+                para_mismatches = self.mismatches.by_paragraph(para_idx)
+                if para_mismatches:
+                    self.highlight_paragraph(para, para_mismatches)
             
-            # Save the document
-            save_path = output_path or self.word_path.replace('.docx', '_linked.docx')
-            doc.save(save_path)
+            # Save the document, copying untouched images and fonts without recompressing them
+            save_changed_parts(doc, self.word_path, save_path)
             print(f"Saved highlighted document to {save_path}")
             return save_path
         
+        except PipelineCancelled:
+            # Do not leave a half-written document behind
+            if streaming and os.path.exists(save_path):
+                os.remove(save_path)
+            raise
         except Exception as e:
             print(f"Error highlighting Word document: {e}")
             return None
     
+    def highlight_paragraph(self, para, para_mismatches):
+        """Split the runs of a paragraph around its mismatches in a single pass."""
+        runs = para.runs
+        texts = [run.text for run in runs]
+        
+        # Prefix offsets of the runs, so the run containing an offset is a bisect away
+        run_starts, hits_by_run = bucket_by_run(texts, para_mismatches)
+        
+        for run_idx, hits in hits_by_run.items():
+            run = runs[run_idx]
+            segments = split_run_text(texts[run_idx], run_starts[run_idx], hits)
+            
+            # Reuse the original run for the first segment and clone it for the rest,
+            # inserting the clones right after it so formatting and order are kept
+            template = copy.deepcopy(run._r)
+            previous = run
+            for seg_idx, (segment_text, mismatch) in enumerate(segments):
+                if seg_idx == 0:
+                    target = run
+                else:
+                    new_r = copy.deepcopy(template)
+                    previous._r.addnext(new_r)
+                    target = Run(new_r, para)
+                target.text = segment_text
+                
+                if mismatch is not None:
+                    target.font.highlight_color = WD_COLOR_INDEX.YELLOW
+                    
+                    # Add bookmark
+                    self.add_bookmark(target._element, mismatch.id)
+                    
+                    # Add hyperlink behavior
+                    self.add_hyperlink_style(target._element, f"mismatch:{mismatch.id}")
+                
+                previous = target
+    
     def add_bookmark(self, element, bookmark_id):
         """Add a bookmark to a run element."""
         bookmark_start = OxmlElement('w:bookmarkStart')
@@ -147,18 +207,107 @@ class WordPdfLinker:
         custom_xml.append(custom_prop)
         element.append(custom_xml)
     
-    def create_pdf_viewer_html(self):
+    def create_pdf_viewer_html(self, check_cancelled=None):
         """Create an HTML file with a PDF viewer that can navigate to specific words."""
         try:
-            # Create a temporary HTML file
-            fd, html_path = tempfile.mkstemp(suffix='.html')
-            os.close(fd)
+            # Create a viewer directory in the asset store
+            viewer_dir = new_viewer_dir()
+            html_path = os.path.join(viewer_dir, 'viewer.html')
+            
+            # Locate every mismatch on its page now, so the viewer only has to draw boxes
+            highlights = compute_page_highlights(self.pdf_path, self.mismatches, check_cancelled)
+            
+            # Write the HTML to the viewer directory
+            with open(html_path, 'w', encoding='utf-8') as f:
+                self.write_viewer_html(f, 'document.pdf', highlights)
+            
+            # Link the PDF next to the HTML from the store, which keeps one copy per content
+            place_file(self.pdf_path, os.path.join(viewer_dir, 'document.pdf'))
+            
+            self.temp_html = html_path
+            return html_path
+        
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            print(f"Error creating PDF viewer HTML: {e}")
+            return None
+    
+    def serve_pdf_viewer(self, port=0, check_cancelled=None):
+        """Serve the PDF viewer from a local HTTP server instead of temp-file copies.
+        
+        Each page first shows an image rendered and cached by the server, then
+        PDF.js renders it from range requests to the PDF; the pages with
+        mismatches are rendered ahead of time. Returns the viewer URL.
+        """
+        try:
+            highlights = compute_page_highlights(self.pdf_path, self.mismatches, check_cancelled)
+            
+            # Without inline data the page fetches mismatches.json and highlights.json
+            html = io.StringIO()
+            self.write_viewer_html(html, 'document.pdf')
+            
+            if self.viewer_server:
+                self.viewer_server.stop()
+            self.viewer_server = ViewerServer(self.pdf_path, html.getvalue(), self.mismatches, highlights, port=port)
+            url = self.viewer_server.start()
             
-            # Extract the PDF file name
-            pdf_filename = os.path.basename(self.pdf_path)
+            # Render the pages with mismatches in the background, so they open instantly
+            self.viewer_server.prewarm(self.mismatches.pages())
             
-            # Create the HTML content with PDF.js
-            html_content = f"""
+            # The Word hyperlink handler opens this with ?mismatch=<id>
+            self.temp_html = url
+            return url
+        
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            print(f"Error starting PDF viewer server: {e}")
+            return None
+    
+    def create_viewer(self, check_cancelled=None):
+        """Start the viewer server, or write the standalone viewer if serving is off or fails.
+        
+        Returns the viewer URL or file path.
+        """
+        with self.viewer_lock:
+            if self.use_viewer_server:
+                url = self.serve_pdf_viewer(check_cancelled=check_cancelled)
+                if url:
+                    return url
+                print("Falling back to a standalone viewer file")
+            return self.create_pdf_viewer_html(check_cancelled)
+    
+    def reset_viewer(self):
+        """Stop the viewer server and forget the viewer, once the PDF or mismatches change."""
+        with self.viewer_lock:
+            if self.viewer_server:
+                self.viewer_server.stop()
+                self.viewer_server = None
+            self.temp_html = None
+    
+    def show_mismatch(self, mismatch_id):
+        """Open the PDF viewer at a mismatch, creating the viewer first if needed."""
+        with self.viewer_lock:
+            if not self.temp_html and not self.create_viewer():
+                return False
+            viewer = self.temp_html
+        
+        if viewer.startswith('http'):
+            url = viewer
+        else:
+            url = Path(viewer).as_uri()
+        webbrowser.open(f"{url}?mismatch={mismatch_id}")
+        return True
+    
+    def write_viewer_html(self, f, pdf_url, highlights=None):
+        """Write the PDF.js viewer page to a text file object.
+        
+        With highlights=None the mismatches and highlight boxes are not inlined;
+        the page fetches them from the viewer server instead, and shows the
+        server's page images while PDF.js renders each page.
+        """
+        html_content = f"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -187,10 +336,53 @@ class WordPdfLinker:
                         background-color: #e0e0e0;
                         font-size: 14px;
                     }}
+                    #page {{
+                        position: relative;
+                        display: inline-block;
+                    }}
+                    #page img, #page canvas {{
+                        display: block;
+                    }}
+                    #tiles {{
+                        position: relative;
+                    }}
+                    #tiles img {{
+                        position: absolute;
+                    }}
+                    .textLayer {{
+                        position: absolute;
+                        left: 0;
+                        top: 0;
+                        right: 0;
+                        bottom: 0;
+                        overflow: hidden;
+                        opacity: 0.2;
+                        line-height: 1;
+                    }}
+                    .textLayer span, .textLayer br {{
+                        color: transparent;
+                        position: absolute;
+                        white-space: pre;
+                        cursor: text;
+                        transform-origin: 0% 0%;
+                    }}
+                    .textLayer ::selection {{
+                        background: rgba(0, 0, 255, 1);
+                    }}
+                    #highlights {{
+                        position: absolute;
+                        left: 0;
+                        top: 0;
+                    }}
                     .highlight {{
-                        background-color: yellow;
+                        position: absolute;
+                        background-color: rgba(255, 255, 0, 0.4);
                         border-radius: 3px;
-                        padding: 2px;
+                        cursor: pointer;
+                    }}
+                    .highlight.selected {{
+                        background-color: rgba(0, 128, 0, 0.4);
+                        outline: 2px solid green;
                     }}
                 </style>
             </head>
@@ -199,6 +391,9 @@ class WordPdfLinker:
                     <button id="prev">Previous</button>
                     <button id="next">Next</button>
                     <span>Page: <span id="page_num"></span> / <span id="page_count"></span></span>
+                    <button id="zoom_out">-</button>
+                    <span id="zoom_label"></span>
+                    <button id="zoom_in">+</button>
                     <span id="word-info" style="margin-left: 20px;"></span>
                 </div>
                 <div id="viewer"></div>
@@ -208,34 +403,97 @@ class WordPdfLinker:
                     // Load PDF.js
                     pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/2.12.313/pdf.worker.min.js';
                     
-                    // The mismatches data
-                    const mismatches = {JSON_MISMATCHES};
+                    // The mismatches data, inline or fetched from the viewer server
+                    let mismatches = {{JSON_MISMATCHES}};
+                    const mismatchesById = {{}};
+                    
+                    // Served pages show the viewer server's cached image until PDF.js has rendered them
+                    const servedPages = mismatches === null;
+                    
+                    // Highlight boxes per page, computed with PyMuPDF: [mismatchId, x0, y0, x1, y1]
+                    let highlights = {{JSON_HIGHLIGHTS}};
                     
                     // Current selected mismatch
                     let selectedMismatchId = null;
                     
                     // Initialize the PDF viewer
                     let pdfDoc = null;
+                    let pdfDocLoading = null;
+                    let pageCount = 0;
                     let pageNum = 1;
                     let pageRendering = false;
                     let pageNumPending = null;
-                    let scale = 1.5;
+                    // Zoom levels the server renders; served pages switch to tiles above the default
+                    let zoomLevels = {json.dumps(ZOOM_LEVELS)};
+                    let defaultZoom = {DEFAULT_ZOOM};
+                    let scale = defaultZoom;
+                    let pageSizes = [];
+                    let tileSize = 0;
                     let canvas = document.createElement('canvas');
                     let ctx = canvas.getContext('2d');
                     let viewer = document.getElementById('viewer');
-                    viewer.appendChild(canvas);
+                    let pageDiv = document.createElement('div');
+                    pageDiv.id = 'page';
+                    let highlightLayer = document.createElement('div');
+                    highlightLayer.id = 'highlights';
+                    let pageImage = document.createElement('img');
+                    pageImage.style.display = 'none';
+                    pageDiv.appendChild(pageImage);
+                    let tileLayer = document.createElement('div');
+                    tileLayer.id = 'tiles';
+                    tileLayer.style.display = 'none';
+                    pageDiv.appendChild(tileLayer);
+                    pageDiv.appendChild(canvas);
+                    // PDF.js text under the highlight boxes, for selecting and searching
+                    let textLayerDiv = document.createElement('div');
+                    textLayerDiv.className = 'textLayer';
+                    pageDiv.appendChild(textLayerDiv);
+                    pageDiv.appendChild(highlightLayer);
+                    viewer.appendChild(pageDiv);
                     
                     // Load the PDF
                     const loadPdf = async () => {{
                         try {{
-                            const loadingTask = pdfjsLib.getDocument({{
-                                url: '{pdf_filename}',
+                            if (servedPages) {{
+                                const [mismatchesResponse, highlightsResponse, documentResponse] = await Promise.all([
+                                    fetch('mismatches.json'),
+                                    fetch('highlights.json'),
+                                    fetch('document.json'),
+                                ]);
+                                mismatches = await mismatchesResponse.json();
+                                highlights = await highlightsResponse.json();
+                                const documentInfo = await documentResponse.json();
+                                pageCount = documentInfo.page_count;
+                                pageSizes = documentInfo.page_sizes;
+                                zoomLevels = documentInfo.zoom_levels;
+                                defaultZoom = documentInfo.default_zoom;
+                                tileSize = documentInfo.tile_size;
+                            }}
+                            for (const mismatch of mismatches) {{
+                                mismatchesById[mismatch.id] = mismatch;
+                            }}
+                            
+                            // Open straight at the mismatch requested in the URL
+                            const mismatchId = new URLSearchParams(window.location.search).get('mismatch');
+                            if (mismatchId && mismatchesById[mismatchId]) {{
+                                selectedMismatchId = mismatchId;
+                                pageNum = mismatchesById[mismatchId].pdf_location.page;
+                            }}
+                            
+                            // Only fetch the byte ranges needed for the pages being shown
+                            pdfDocLoading = pdfjsLib.getDocument({{
+                                url: {json.dumps(pdf_url)},
                                 cMapUrl: 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/2.12.313/cmaps/',
                                 cMapPacked: true,
-                            }});
-                            
-                            pdfDoc = await loadingTask.promise;
-                            document.getElementById('page_count').textContent = pdfDoc.numPages;
+                                disableAutoFetch: true,
+                                disableStream: true,
+                            }}).promise;
+                            if (!servedPages) {{
+                                // Without the server there is nothing to show until PDF.js has the document
+                                pdfDoc = await pdfDocLoading;
+                                pageCount = pdfDoc.numPages;
+                            }}
+                            document.getElementById('page_count').textContent = pageCount;
                             
                             // Initial render
                             renderPage(pageNum);
@@ -249,8 +507,18 @@ class WordPdfLinker:
                     const renderPage = async (num) => {{
                         pageRendering = true;
                         document.getElementById('page_num').textContent = num;
+                        document.getElementById('zoom_label').textContent = Math.round(scale * 100) + '%';
                         
                         try {{
+                            if (servedPages) {{
+                                // The cached image and its boxes show first; PDF.js replaces the image below
+                                canvas.style.display = 'none';
+                                textLayerDiv.replaceChildren();
+                                await showRasterPage(num).catch(error => console.warn('No cached page image:', error));
+                                drawHighlights(num);
+                                pdfDoc = await pdfDocLoading;
+                            }}
+                            
                             const page = await pdfDoc.getPage(num);
                             const viewport = page.getViewport({{ scale }});
                             
@@ -263,92 +531,13 @@ class WordPdfLinker:
                             }};
                             
                             await page.render(renderContext).promise;
+                            await renderTextLayer(page, viewport);
+                            canvas.style.display = 'block';
+                            pageImage.style.display = 'none';
+                            tileLayer.style.display = 'none';
                             
-                            // Extract text content for highlighting
-                            const textContent = await page.getTextContent();
-                            
-                            // Find mismatches on this page
-                            const pageMismatches = mismatches.filter(m => m.pdf_location.page === num);
-                            
-                            if (pageMismatches.length > 0) {{
-                                // Create text overlay for highlighting
-                                const textLayerDiv = document.createElement('div');
-                                textLayerDiv.className = 'textLayer';
-                                textLayerDiv.style.position = 'absolute';
-                                textLayerDiv.style.left = canvas.offsetLeft + 'px';
-                                textLayerDiv.style.top = canvas.offsetTop + 'px';
-                                textLayerDiv.style.height = canvas.height + 'px';
-                                textLayerDiv.style.width = canvas.width + 'px';
-                                viewer.appendChild(textLayerDiv);
-                                
-                                // Create text spans
-                                let lastSpan = null;
-                                let lastY = null;
-                                
-                                for (const item of textContent.items) {{
-                                    const tx = pdfjsLib.Util.transform(
-                                        viewport.transform,
-                                        [1, 0, 0, -1, item.transform[4], item.transform[5]]
-                                    );
-                                    
-                                    const style = window.getComputedStyle(textLayerDiv);
-                                    const fontAscent = parseFloat(style.fontSize) * 0.8;
-                                    
-                                    const div = document.createElement('span');
-                                    div.textContent = item.str;
-                                    div.style.left = Math.floor(tx[0]) + 'px';
-                                    div.style.top = Math.floor(tx[1] - fontAscent) + 'px';
-                                    div.style.fontSize = Math.floor(item.height * viewport.scale) + 'px';
-                                    div.style.fontFamily = item.fontName;
-                                    div.style.position = 'absolute';
-                                    
-                                    // Check if this text item matches any of our mismatches
-                                    for (const mismatch of pageMismatches) {{
-                                        if (item.str.includes(mismatch.text)) {{
-                                            const matchIndex = item.str.indexOf(mismatch.text);
-                                            
-                                            if (matchIndex !== -1) {{
-                                                // Create a wrapper span for the word
-                                                const wordSpan = document.createElement('span');
-                                                wordSpan.textContent = mismatch.text;
-                                                wordSpan.className = 'highlight';
-                                                wordSpan.dataset.mismatchId = mismatch.id;
-                                                
-                                                // Mark as selected if this is the current mismatch
-                                                if (mismatch.id === selectedMismatchId) {{
-                                                    wordSpan.style.backgroundColor = 'green';
-                                                    wordSpan.style.color = 'white';
-                                                    
-                                                    // Scroll this item into view
-                                                    setTimeout(() => {{
-                                                        wordSpan.scrollIntoView({{
-                                                            behavior: 'smooth',
-                                                            block: 'center'
-                                                        }});
-                                                        
-                                                        // Update info
-                                                        const wordInfo = document.getElementById('word-info');
-                                                        wordInfo.textContent = `Viewing: "${mismatch.text}" - PDF formatting: ${formatFormattingInfo(mismatch.pdf_formatting)}, Word formatting: ${formatFormattingInfo(mismatch.word_formatting)}`;
-                                                    }}, 100);
-                                                }}
-                                                
-                                                // Handle click to select this mismatch
-                                                wordSpan.addEventListener('click', () => {{
-                                                    selectedMismatchId = mismatch.id;
-                                                    renderPage(pageNum);
-                                                }});
-                                                
-                                                div.textContent = item.str.substring(0, matchIndex);
-                                                div.appendChild(wordSpan);
-                                                div.appendChild(document.createTextNode(item.str.substring(matchIndex + mismatch.text.length)));
-                                                break;
-                                            }}
-                                        }}
-                                    }}
-                                    
-                                    textLayerDiv.appendChild(div);
-                                }}
-                            }}
+                            // Draw the precomputed highlight boxes for this page
+                            drawHighlights(num);
                             
                             pageRendering = false;
                             if (pageNumPending !== null) {{
@@ -362,6 +551,114 @@ class WordPdfLinker:
                         }}
                     }};
                     
+                    // Transparent, selectable text laid over the canvas, so the browser can find it
+                    async function renderTextLayer(page, viewport) {{
+                        textLayerDiv.replaceChildren();
+                        const textContent = await page.getTextContent();
+                        await pdfjsLib.renderTextLayer({{
+                            textContent: textContent,
+                            container: textLayerDiv,
+                            viewport: viewport,
+                            textDivs: [],
+                        }}).promise;
+                    }}
+                    
+                    // Rendered and cached on the server, at the same scale as the boxes: one image
+                    // up to the default zoom, and above it a grid of tiles the browser loads as they scroll into view
+                    async function showRasterPage(num) {{
+                        tileLayer.replaceChildren();
+                        if (scale <= defaultZoom) {{
+                            tileLayer.style.display = 'none';
+                            pageImage.style.display = 'block';
+                            pageImage.src = 'pages/' + num + '.png?zoom=' + scale;
+                            await pageImage.decode();
+                            return;
+                        }}
+                        
+                        const [width, height] = pageSizes[num - 1];
+                        const pixelWidth = Math.floor(width * scale);
+                        const pixelHeight = Math.floor(height * scale);
+                        pageImage.style.display = 'none';
+                        tileLayer.style.display = 'block';
+                        tileLayer.style.width = pixelWidth + 'px';
+                        tileLayer.style.height = pixelHeight + 'px';
+                        for (let row = 0; row * tileSize < pixelHeight; row++) {{
+                            for (let column = 0; column * tileSize < pixelWidth; column++) {{
+                                const tile = document.createElement('img');
+                                tile.loading = 'lazy';
+                                tile.style.left = (column * tileSize) + 'px';
+                                tile.style.top = (row * tileSize) + 'px';
+                                tile.src = `tiles/${{scale}}/${{num}}/${{column}}_${{row}}.png`;
+                                tileLayer.appendChild(tile);
+                            }}
+                        }}
+                    }}
+                    
+                    // Step through the zoom levels and redraw the current page
+                    function changeZoom(step) {{
+                        const index = zoomLevels.indexOf(scale) + step;
+                        if (index < 0 || index >= zoomLevels.length) return;
+                        scale = zoomLevels[index];
+                        queueRenderPage(pageNum);
+                    }}
+                    document.getElementById('zoom_in').addEventListener('click', () => changeZoom(1));
+                    document.getElementById('zoom_out').addEventListener('click', () => changeZoom(-1));
+                    
+                    // Place one box per highlight rectangle over the page
+                    function drawHighlights(num) {{
+                        highlightLayer.replaceChildren();
+                        
+                        for (const [mismatchId, x0, y0, x1, y1] of highlights[num] || []) {{
+                            const box = document.createElement('div');
+                            box.className = 'highlight';
+                            box.dataset.mismatchId = mismatchId;
+                            box.style.left = (x0 * scale) + 'px';
+                            box.style.top = (y0 * scale) + 'px';
+                            box.style.width = ((x1 - x0) * scale) + 'px';
+                            box.style.height = ((y1 - y0) * scale) + 'px';
+                            highlightLayer.appendChild(box);
+                        }}
+                        
+                        if (selectedMismatchId !== null) {{
+                            selectMismatch(selectedMismatchId);
+                        }}
+                    }}
+                    
+                    // Mark a mismatch as selected without re-rendering the page
+                    function selectMismatch(mismatchId) {{
+                        selectedMismatchId = mismatchId;
+                        
+                        let selectedBox = null;
+                        for (const box of highlightLayer.children) {{
+                            const isSelected = box.dataset.mismatchId === mismatchId;
+                            box.classList.toggle('selected', isSelected);
+                            if (isSelected && !selectedBox) {{
+                                selectedBox = box;
+                            }}
+                        }}
+                        
+                        const mismatch = mismatchesById[mismatchId];
+                        if (mismatch) {{
+                            const wordInfo = document.getElementById('word-info');
+                            wordInfo.textContent = `Viewing: "${{mismatch.text}}" - PDF formatting: ${{formatFormattingInfo(mismatch.pdf_formatting)}}, Word formatting: ${{formatFormattingInfo(mismatch.word_formatting)}}`;
+                        }}
+                        
+                        if (selectedBox) {{
+                            selectedBox.scrollIntoView({{
+                                behavior: 'smooth',
+                                block: 'center'
+                            }});
+                        }}
+                    }}
+                    
+                    // Handle clicks on highlight boxes
+                    highlightLayer.addEventListener('click', (event) => {{
+                        const mismatchId = event.target.dataset.mismatchId;
+                        if (mismatchId) {{
+                            selectMismatch(mismatchId);
+                        }}
+                    }});
+                    
                     // Format the formatting info for display
                     function formatFormattingInfo(formatting) {{
                         const styles = [];
@@ -380,7 +677,7 @@ class WordPdfLinker:
                     
                     // Go to next page
                     document.getElementById('next').addEventListener('click', () => {{
-                        if (pageNum >= pdfDoc.numPages) return;
+                        if (pageNum >= pageCount) return;
                         pageNum++;
                         queueRenderPage(pageNum);
                     }});
@@ -396,50 +693,53 @@ class WordPdfLinker:
                     
                     // Handle navigation from Word
                     function navigateToMismatch(mismatchId) {{
-                        const mismatch = mismatches.find(m => m.id === mismatchId);
+                        const mismatch = mismatchesById[mismatchId];
                         if (mismatch) {{
                             selectedMismatchId = mismatchId;
                             pageNum = mismatch.pdf_location.page;
-                            renderPage(pageNum);
+                            if (pageCount) {{
+                                queueRenderPage(pageNum);
+                            }}
                         }}
                     }}
                     
-                    // Check for mismatch ID in URL
+                    // Load the PDF; a mismatch ID in the URL is picked up once the data is loaded
                     window.onload = () => {{
                         loadPdf();
-                        
-                        const urlParams = new URLSearchParams(window.location.search);
-                        const mismatchId = urlParams.get('mismatch');
-                        if (mismatchId) {{
-                            navigateToMismatch(mismatchId);
-                        }}
                     }};
                 </script>
             </body>
             </html>
-            """.replace("{JSON_MISMATCHES}", json.dumps(self.mismatches))
-            
-            # Write the HTML to the temporary file
-            with open(html_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            
-            # Copy the PDF to the same directory as the HTML
-            pdf_copy_path = os.path.join(os.path.dirname(html_path), pdf_filename)
-            with open(self.pdf_path, 'rb') as src, open(pdf_copy_path, 'wb') as dst:
-                dst.write(src.read())
-            
-            self.temp_html = html_path
-            return html_path
+            """
         
-        except Exception as e:
-            print(f"Error creating PDF viewer HTML: {e}")
-            return None
+        # Stream the data into the page instead of building one big JSON string
+        html_head, html_rest = html_content.split("{JSON_MISMATCHES}", 1)
+        html_middle, html_tail = html_rest.split("{JSON_HIGHLIGHTS}", 1)
+        f.write(html_head)
+        if highlights is None:
+            f.write('null')
+        else:
+            self.mismatches.write_json(f)
+        f.write(html_middle)
+        f.write('null' if highlights is None else json.dumps(highlights))
+        f.write(html_tail)
     
     def setup_word_event_handler(self, word_doc_path):
-        """Set up an event handler for the Word document to handle clicks on mismatched words."""
+        """Set up an event handler for the Word document to handle clicks on mismatched words.
+        
+        The Word objects are apartment-threaded COM objects, so this must run on
+        the thread that keeps using them (the Tk thread in the GUI), which later
+        calls release_word.
+        """
+        if pythoncom is None:
+            print("Word event handler requires pywin32 on Windows")
+            return False
+        
         try:
-            # Initialize COM
-            pythoncom.CoInitialize()
+            # Initialize COM once for this thread
+            if not self.com_initialized:
+                pythoncom.CoInitialize()
+                self.com_initialized = True
             
             # Create a Word application
             word_app = win32com.client.Dispatch("Word.Application")
@@ -483,11 +783,25 @@ class WordPdfLinker:
             print(f"Error setting up Word event handler: {e}")
             return False
     
+    def release_word(self):
+        """Drop the Word objects and uninitialize COM, on the thread that set them up."""
+        self.word_doc = None
+        self.word_app = None
+        if self.com_initialized:
+            pythoncom.CoUninitialize()
+            self.com_initialized = False
+    
     def run_gui(self):
         """Run a GUI to load documents and start the linking process."""
+        # Tk is only needed here, so batch_link and other headless users run without it
+        import tkinter as tk
+        from tkinter import filedialog, messagebox
+        from tkinter import ttk
+        from mismatch_browser import MismatchBrowser
+        
         root = tk.Tk()
         root.title("Word-PDF Linker")
-        root.geometry("600x500")
+        root.geometry("700x750")
         
         # Create a main frame
         main_frame = ttk.Frame(root, padding="10")
@@ -523,6 +837,8 @@ class WordPdfLinker:
             if file_path:
                 pdf_path_var.set(file_path)
                 self.pdf_path = file_path
+                # The viewer shows the old PDF; the next one is built on demand
+                self.reset_viewer()
         
         ttk.Button(pdf_frame, text="Browse", command=browse_pdf).pack(side=tk.RIGHT, padx=5, pady=5)
         
@@ -537,10 +853,37 @@ class WordPdfLinker:
             file_path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
             if file_path:
                 mismatches_path_var.set(file_path)
-                self.load_mismatches(file_path)
+                if self.load_mismatches(file_path):
+                    # Mismatch ids are reused across files, so the old viewer would show the wrong ones
+                    self.reset_viewer()
+                    browser.set_store(self.mismatches)
         
+        def detect():
+            if not self.word_path or not self.pdf_path:
+                messagebox.showerror("Error", "Please select Word and PDF documents")
+                return
+            output_path = os.path.splitext(self.word_path)[0] + '_mismatches.json'
+            # Extraction and alignment take a while on large documents, so they run on the worker
+            start_worker(run_detect, len(DETECT_STAGES), output_path)
+        
+        detect_button = ttk.Button(mismatches_frame, text="Detect", command=detect)
+        detect_button.pack(side=tk.RIGHT, padx=5, pady=5)
         ttk.Button(mismatches_frame, text="Browse", command=browse_mismatches).pack(side=tk.RIGHT, padx=5, pady=5)
         
+        # Mismatch list; double-clicking a row or pressing Return opens the viewer at that mismatch
+        browser_frame = ttk.LabelFrame(main_frame, text="Mismatches")
+        browser_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        # The first activation builds the viewer, so it runs off the Tk thread;
+        # show_mismatch and the pipeline share the linker's viewer lock
+        def open_mismatch(record):
+            def run():
+                self.show_mismatch(record.id)
+            threading.Thread(target=run, daemon=True).start()
+        
+        browser = MismatchBrowser(browser_frame, on_activate=open_mismatch)
+        browser.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
         # Status display
         status_frame = ttk.LabelFrame(main_frame, text="Status")
         status_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -552,76 +895,198 @@ class WordPdfLinker:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         status_text.config(yscrollcommand=scrollbar.set)
         
-        def log(message):
-            status_text.insert(tk.END, message + "\n")
-            status_text.see(tk.END)
-            print(message)
+        # Pipeline progress and controls
+        progress_frame = ttk.Frame(main_frame)
+        progress_frame.pack(fill=tk.X, pady=5)
+        
+        progress_var = tk.DoubleVar()
+        stage_var = tk.StringVar(value="Idle")
+        progress_bar = ttk.Progressbar(progress_frame, variable=progress_var, maximum=len(PIPELINE_STAGES))
+        progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Label(progress_frame, textvariable=stage_var, width=30).pack(side=tk.LEFT, padx=5)
         
-        # Redirect print to the status text
-        class TextRedirector:
-            def __init__(self, text_widget):
-                self.text_widget = text_widget
+        # Buffer print output from any thread; the Tk loop inserts it into the widget in batches
+        class QueueWriter:
+            def __init__(self, max_chunks):
+                self.chunks = deque(maxlen=max_chunks)
             
             def write(self, string):
-                self.text_widget.insert(tk.END, string)
-                self.text_widget.see(tk.END)
+                self.chunks.append(string)
             
             def flush(self):
                 pass
+            
+            def drain(self):
+                parts = []
+                while self.chunks:
+                    parts.append(self.chunks.popleft())
+                return ''.join(parts)
         
-        sys.stdout = TextRedirector(status_text)
+        log_sink = QueueWriter(LOG_MAX_PENDING_WRITES)
+        sys.stdout = log_sink
         
-        # Process button
-        def process_documents():
-            if not self.word_path:
-                messagebox.showerror("Error", "Please select a Word document")
-                return
+        def log(message):
+            print(message)
+        
+        # Events from the worker thread: ('stage', index, label), ('setup_word', path),
+        # ('detected', path), ('done',), ('cancelled',), ('error', message)
+        events = queue.Queue()
+        cancel_event = threading.Event()
+        
+        def set_running(running):
+            process_button.config(state=tk.DISABLED if running else tk.NORMAL)
+            detect_button.config(state=tk.DISABLED if running else tk.NORMAL)
+            cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+        
+        def start_worker(target, stage_count, *args):
+            # Run off the Tk thread so the window stays responsive
+            cancel_event.clear()
+            progress_var.set(0)
+            progress_bar.config(maximum=stage_count)
+            set_running(True)
+            threading.Thread(target=target, args=args, daemon=True).start()
+        
+        def check_cancelled():
+            if cancel_event.is_set():
+                raise PipelineCancelled()
+        
+        def handle_event(event):
+            kind = event[0]
+            if kind == 'stage':
+                progress_var.set(event[1])
+                stage_var.set(event[2])
+            elif kind == 'setup_word':
+                # COM objects belong to the thread that creates them, so Word is driven from the Tk thread
+                if self.setup_word_event_handler(event[1]):
+                    log("Word event handler set up successfully")
+                else:
+                    log("Failed to set up Word event handler, but you can still use the documents")
+                log("Processing complete. Open the linked Word document and click on highlighted words to view them in the PDF.")
+                handle_event(('done',))
+            elif kind == 'detected':
+                # The detected mismatches replace the loaded ones, and the viewer built for those
+                self.reset_viewer()
+                mismatches_path_var.set(event[1])
+                browser.set_store(self.mismatches)
+                handle_event(('done',))
+            elif kind == 'done':
+                progress_var.set(progress_bar.cget('maximum'))
+                stage_var.set("Done")
+                set_running(False)
+            elif kind == 'cancelled':
+                stage_var.set("Cancelled")
+                set_running(False)
+            elif kind == 'error':
+                stage_var.set("Failed")
+                set_running(False)
+                messagebox.showerror("Error", event[1])
+        
+        def poll():
+            text = log_sink.drain()
+            if text:
+                status_text.insert(tk.END, text)
+                # Keep only the most recent lines in the widget
+                line_count = int(status_text.index('end-1c').split('.')[0])
+                if line_count > LOG_MAX_LINES:
+                    status_text.delete('1.0', f'{line_count - LOG_MAX_LINES}.0')
+                status_text.see(tk.END)
             
-            if not self.pdf_path:
-                messagebox.showerror("Error", "Please select a PDF document")
-                return
+            while True:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    break
+                handle_event(event)
             
-            if not self.mismatches:
-                messagebox.showerror("Error", "Please load mismatches JSON data")
-                return
+            root.after(UI_POLL_INTERVAL_MS, poll)
+        
+        def run_detect(output_path):
+            def progress(index):
+                events.put(('stage', index, DETECT_STAGES[index]))
+            
+            try:
+                log("Detecting mismatches...")
+                if self.detect_mismatches(output_path, progress, check_cancelled):
+                    events.put(('detected', output_path))
+                else:
+                    events.put(('error', "Failed to detect mismatches"))
+            except PipelineCancelled:
+                log("Detection cancelled")
+                events.put(('cancelled',))
+        
+        def run_pipeline():
+            def stage(index):
+                check_cancelled()
+                events.put(('stage', index, PIPELINE_STAGES[index]))
             
             try:
                 log("Processing documents...")
                 
-                # Highlight and add links to Word document
-                linked_doc_path = self.highlight_word_document()
+                # Highlight and add links to Word document; cancelling also stops it between paragraphs
+                stage(0)
+                linked_doc_path = self.highlight_word_document(check_cancelled=check_cancelled)
                 
                 if not linked_doc_path:
-                    messagebox.showerror("Error", "Failed to process Word document")
+                    events.put(('error', "Failed to process Word document"))
                     return
                 
                 log(f"Created linked Word document: {linked_doc_path}")
                 
-                # Create PDF viewer HTML
-                html_path = self.create_pdf_viewer_html()
+                # Serve the PDF viewer, or write it as HTML
+                stage(1)
+                viewer = self.create_viewer(check_cancelled)
                 
-                if not html_path:
-                    messagebox.showerror("Error", "Failed to create PDF viewer")
+                if not viewer:
+                    events.put(('error', "Failed to create PDF viewer"))
                     return
                 
-                log(f"Created PDF viewer HTML: {html_path}")
+                log(f"PDF viewer ready: {viewer}")
                 
-                # Set up Word event handler
-                if self.setup_word_event_handler(linked_doc_path):
-                    log("Word event handler set up successfully")
-                else:
-                    log("Failed to set up Word event handler, but you can still use the documents")
-                
-                log("Processing complete. Open the linked Word document and click on highlighted words to view them in the PDF.")
+                # Set up Word event handler, on the Tk thread
+                stage(2)
+                events.put(('setup_word', linked_doc_path))
             
+            except PipelineCancelled:
+                log("Processing cancelled")
+                events.put(('cancelled',))
             except Exception as e:
                 log(f"Error processing documents: {e}")
-                messagebox.showerror("Error", f"Processing failed: {e}")
+                events.put(('error', f"Processing failed: {e}"))
+        
+        # Process button
+        def process_documents():
+            if not self.word_path:
+                messagebox.showerror("Error", "Please select a Word document")
+                return
+            
+            if not self.pdf_path:
+                messagebox.showerror("Error", "Please select a PDF document")
+                return
+            
+            if not self.mismatches:
+                messagebox.showerror("Error", "Please load mismatches JSON data")
+                return
+            
+            start_worker(run_pipeline, len(PIPELINE_STAGES))
+        
+        def cancel_processing():
+            cancel_event.set()
+            stage_var.set("Cancelling...")
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=10)
+        
+        process_button = ttk.Button(button_frame, text="Process Documents", command=process_documents)
+        process_button.pack(side=tk.LEFT, padx=5)
+        cancel_button = ttk.Button(button_frame, text="Cancel", command=cancel_processing, state=tk.DISABLED)
+        cancel_button.pack(side=tk.LEFT, padx=5)
         
-        ttk.Button(main_frame, text="Process Documents", command=process_documents).pack(pady=10)
+        root.after(UI_POLL_INTERVAL_MS, poll)
         
         # Run the GUI
         root.mainloop()
+        self.reset_viewer()
+        self.release_word()
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+import tkinter as tk
+from tkinter import ttk
+from array import array
+
+from mismatch_store import BOLD, ITALIC, UNDERLINE, FORMATTING_FLAGS
+
+# Formatting kind filter choices, as the bits that must differ between Word and PDF
+KIND_FILTERS = {
+    'All': 0,
+    'Bold': BOLD,
+    'Italic': ITALIC,
+    'Underline': UNDERLINE,
+}
+
+COLUMNS = (
+    ('id', "ID", 110),
+    ('text', "Text", 160),
+    ('page', "Page", 50),
+    ('paragraph', "Paragraph", 70),
+    ('kind', "Differs in", 120),
+)
+
+DEFAULT_ROW_HEIGHT = 20
+FILTER_DELAY_MS = 250
+
+# Stand-in for a missing page or paragraph in the int columns
+MISSING = -1
+
+
+def _kind_label(diff):
+    return ', '.join(name for name, flag in FORMATTING_FLAGS if diff & flag) or '-'
+
+
+class MismatchBrowser(ttk.Frame):
+    """Mismatch list that only materialises the rows in view.
+
+    Sorting and filtering work on arrays of record positions, so a store with
+    hundreds of thousands of mismatches never fills the Treeview; scrolling
+    just re-renders the visible window.
+    """
+
+    def __init__(self, parent, on_select=None, on_activate=None, rows=10):
+        super().__init__(parent)
+        # on_select follows the selection, arrow keys included; on_activate is double-click or Return
+        self.on_select = on_select
+        self.on_activate = on_activate
+        self.rows = rows
+        self.records = []
+        self.pages = array('i')
+        self.paragraphs = array('i')
+        self.kinds = b''
+        self.view = array('i')
+        self.offset = 0
+        self.selected = None
+        self.sort_column = 'id'
+        self.sort_reverse = False
+        self._sorted = {}
+        self._filter_job = None
+
+        # Filter bar
+        filter_frame = ttk.Frame(self)
+        filter_frame.pack(fill=tk.X)
+
+        self.page_var = tk.StringVar()
+        self.paragraph_var = tk.StringVar()
+        self.kind_var = tk.StringVar(value='All')
+        self.count_var = tk.StringVar(value="No mismatches")
+
+        ttk.Label(filter_frame, text="Page").pack(side=tk.LEFT, padx=(5, 2))
+        page_entry = ttk.Entry(filter_frame, textvariable=self.page_var, width=6)
+        page_entry.pack(side=tk.LEFT)
+        ttk.Label(filter_frame, text="Paragraph").pack(side=tk.LEFT, padx=(10, 2))
+        paragraph_entry = ttk.Entry(filter_frame, textvariable=self.paragraph_var, width=6)
+        paragraph_entry.pack(side=tk.LEFT)
+        ttk.Label(filter_frame, text="Differs in").pack(side=tk.LEFT, padx=(10, 2))
+        kind_box = ttk.Combobox(filter_frame, textvariable=self.kind_var, values=list(KIND_FILTERS),
+                                state='readonly', width=10)
+        kind_box.pack(side=tk.LEFT)
+        ttk.Label(filter_frame, textvariable=self.count_var).pack(side=tk.RIGHT, padx=5)
+
+        for entry in (page_entry, paragraph_entry):
+            entry.bind('<KeyRelease>', lambda event: self._schedule_filter())
+        kind_box.bind('<<ComboboxSelected>>', lambda event: self.apply_filter())
+
+        # Fixed-height list with its own scrollbar over the filtered view
+        list_frame = ttk.Frame(self)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.tree = ttk.Treeview(list_frame, columns=[c[0] for c in COLUMNS], show='headings',
+                                 height=rows, selectmode='browse')
+        for column, heading, width in COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=column == 'text')
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Double-1>', self._on_double_click)
+        self.tree.bind('<Return>', lambda event: self._activate())
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda event: self.scroll(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.scroll(1, 'units'))
+        self.tree.bind('<Up>', lambda event: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda event: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda event: self._move_selection(-self.rows))
+        self.tree.bind('<Next>', lambda event: self._move_selection(self.rows))
+
+    def set_store(self, store):
+        """Show the mismatches of a MismatchStore."""
+        self.records = store.records
+        n = len(self.records)
+
+        # Columns used by sorting and filtering, by record position
+        self.pages = array('i', (MISSING if r.page is None else r.page for r in self.records))
+        self.paragraphs = array('i', (MISSING if r.paragraph is None else r.paragraph for r in self.records))
+        self.kinds = bytes(r.word_flags ^ r.pdf_flags for r in self.records)
+        self._sorted = {'id': array('i', range(n))}
+        self.selected = None
+        self.apply_filter()
+
+    def _sorted_positions(self, column):
+        """Record positions ordered by a column, computed once per column."""
+        positions = self._sorted.get(column)
+        if positions is None:
+            records = self.records
+            if column == 'text':
+                key = lambda i: (records[i].text.casefold(), i)
+            elif column == 'page':
+                key = lambda i: (self.pages[i], self.paragraphs[i], records[i].offset or 0, i)
+            elif column == 'paragraph':
+                key = lambda i: (self.paragraphs[i], records[i].offset or 0, i)
+            else:
+                key = lambda i: (self.kinds[i], i)
+            positions = self._sorted[column] = array('i', sorted(range(len(records)), key=key))
+        return positions
+
+    def sort_by(self, column):
+        """Sort by a column; sorting by the same column again reverses the order."""
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.apply_filter()
+
+    def _schedule_filter(self):
+        # Wait for typing to pause before refiltering
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        """Rebuild the filtered, sorted view of record positions and show its top."""
+        self._filter_job = None
+        page = self._parse_int(self.page_var.get())
+        paragraph = self._parse_int(self.paragraph_var.get())
+        kind = KIND_FILTERS.get(self.kind_var.get(), 0)
+
+        positions = self._sorted_positions(self.sort_column) if self.records else array('i')
+        if page is not None or paragraph is not None or kind:
+            pages, paragraphs, kinds = self.pages, self.paragraphs, self.kinds
+            positions = array('i', (
+                i for i in positions
+                if (page is None or pages[i] == page)
+                and (paragraph is None or paragraphs[i] == paragraph)
+                and (not kind or kinds[i] & kind)
+            ))
+        if self.sort_reverse:
+            positions = positions[::-1]
+
+        self.view = positions
+        self.offset = 0
+        self.count_var.set(f"{len(positions):,} of {len(self.records):,} mismatches")
+        self.render()
+
+    @staticmethod
+    def _parse_int(value):
+        value = value.strip()
+        return int(value) if value.lstrip('-').isdigit() else None
+
+    def render(self):
+        """Replace the Treeview rows with the visible window of the view."""
+        self.tree.delete(*self.tree.get_children())
+        window = self.view[self.offset:self.offset + self.rows]
+        for i in window:
+            record = self.records[i]
+            self.tree.insert('', tk.END, iid=str(i), values=(
+                record.id,
+                record.text,
+                '' if record.page is None else record.page,
+                '' if record.paragraph is None else record.paragraph,
+                _kind_label(self.kinds[i]),
+            ))
+        if self.selected is not None and self.tree.exists(str(self.selected)):
+            self.tree.selection_set(str(self.selected))
+            self.tree.focus(str(self.selected))
+
+        total = len(self.view)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        """Show the window starting at a view offset (clamped)."""
+        offset = max(0, min(offset, len(self.view) - self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll(self, amount, what):
+        self.scroll_to(self.offset + amount * (self.rows if what == 'pages' else 1))
+
+    def _on_scrollbar(self, action, value, what=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(value) * len(self.view)))
+        else:
+            self.scroll(int(value), what)
+
+    def _on_resize(self, event):
+        # Show as many rows as fit in the widget
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or DEFAULT_ROW_HEIGHT)
+        rows = max(1, event.height // row_height - 1)
+        if rows != self.rows:
+            self.rows = rows
+            self.tree.configure(height=rows)
+            self.render()
+
+    def _move_selection(self, step):
+        # Arrow keys move through the whole view, not just the rendered rows
+        if not self.view:
+            return 'break'
+        try:
+            index = self.view.index(self.selected) + step
+        except (ValueError, TypeError):
+            index = self.offset
+        index = max(0, min(index, len(self.view) - 1))
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.rows:
+            self.scroll_to(index - self.rows + 1)
+        self.tree.selection_set(str(self.view[index]))
+        return 'break'
+
+    def _on_tree_select(self, event):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        position = int(selection[0])
+        # Re-selecting the same row while rendering is not a new selection
+        if position == self.selected:
+            return
+        self.selected = position
+        self.tree.focus(selection[0])
+        if self.on_select:
+            self.on_select(self.records[position])
+
+    def _on_double_click(self, event):
+        # Double-clicking a heading sorts twice; only rows activate
+        if self.tree.identify_region(event.x, event.y) == 'cell':
+            self._activate()
+
+    def _activate(self):
+        if self.selected is not None and self.on_activate:
+            self.on_activate(self.records[self.selected])
@@ -0,0 +1,315 @@
+import json
+import re
+import sys
+import time
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+import docx
+from docx.enum.style import WD_STYLE_TYPE
+
+from pdf_extract import extract_pages
+from mismatch_store import BOLD, ITALIC, UNDERLINE, flags_to_formatting
+
+TOKEN_RE = re.compile(r'\S+')
+
+# PyMuPDF span flags
+PDF_ITALIC_FLAG = 2
+PDF_BOLD_FLAG = 16
+
+# PyMuPDF span flags carry no underline bit, so only these are compared by default
+DEFAULT_COMPARE_FLAGS = BOLD | ITALIC
+
+# Gaps between anchors smaller than this (len_a * len_b) are aligned with difflib
+SMALL_GAP_CELLS = 4096
+
+# Steps of detect_mismatches, in order, as reported to its progress callback
+DETECT_STAGES = (
+    "Reading Word document",
+    "Reading PDF",
+    "Aligning words",
+)
+
+
+class Token:
+    """A word with its location and formatting bit flags."""
+    __slots__ = ('text', 'key', 'paragraph', 'offset', 'page', 'flags')
+
+    def __init__(self, text, paragraph, offset, page, flags):
+        self.text = text
+        self.key = normalize_token(text)
+        self.paragraph = paragraph
+        self.offset = offset
+        self.page = page
+        self.flags = flags
+
+
+def normalize_token(text):
+    """Comparison key for a token: case-folded, without surrounding punctuation."""
+    key = text.strip('.,;:!?()[]{}"\'“”‘’').casefold()
+    return key or text.casefold()
+
+
+def _style_value(styles, style_id, attr, cache):
+    """Resolve a font attribute through a style and its base styles (None if unset)."""
+    key = (style_id, attr)
+    if key not in cache:
+        value = None
+        style = styles.get(style_id)
+        while style is not None and value is None:
+            value = getattr(style.font, attr)
+            style = style.base_style
+        cache[key] = value
+    return cache[key]
+
+
+def _run_flags(run, para_style_id, styles, cache):
+    """Effective bold/italic/underline of a run as bit flags."""
+    flags = 0
+    for attr, flag in (('bold', BOLD), ('italic', ITALIC), ('underline', UNDERLINE)):
+        value = getattr(run.font, attr)
+        if value is None:
+            # Character style first, then the paragraph style
+            value = _style_value(styles, run._r.style, attr, cache)
+        if value is None:
+            value = _style_value(styles, para_style_id, attr, cache)
+        if value:
+            flags |= flag
+    return flags
+
+
+def extract_word_tokens(docx_path, check_cancelled=None):
+    """Tokenize a docx, tagging each word with paragraph, offset and run formatting.
+
+    Paragraph indexes and offsets match doc.paragraphs and para.runs, the
+    locations highlight_word_document expects. check_cancelled(), if given, is
+    called before each paragraph and may raise to stop.
+    """
+    doc = docx.Document(docx_path)
+
+    # Styles are looked up by id here; python-docx rescans styles.xml on every lookup
+    styles = {style.style_id: style for style in doc.styles}
+    default_para_style = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+    default_para_style_id = default_para_style.style_id if default_para_style is not None else None
+    style_cache = {}
+    tokens = []
+
+    for para_idx, para in enumerate(doc.paragraphs):
+        if check_cancelled:
+            check_cancelled()
+        para_style_id = para._p.style or default_para_style_id
+        texts = []
+        run_starts = []
+        run_flags = []
+        offset = 0
+        for run in para.runs:
+            text = run.text
+            run_starts.append(offset)
+            run_flags.append(_run_flags(run, para_style_id, styles, style_cache))
+            texts.append(text)
+            offset += len(text)
+
+        para_text = ''.join(texts)
+        for match in TOKEN_RE.finditer(para_text):
+            # Formatting of the run the word starts in
+            run_idx = bisect_left(run_starts, match.start() + 1) - 1
+            tokens.append(Token(match.group(), para_idx, match.start(), None, run_flags[run_idx]))
+    return tokens
+
+
+def _span_flags(span):
+    """Bold/italic of a PyMuPDF span as bit flags, from its flags and font name."""
+    font = span.get('font', '')
+    flags = 0
+    if span['flags'] & PDF_BOLD_FLAG or 'Bold' in font or 'Black' in font:
+        flags |= BOLD
+    if span['flags'] & PDF_ITALIC_FLAG or 'Italic' in font or 'Oblique' in font:
+        flags |= ITALIC
+    return flags
+
+
+def extract_pdf_tokens(pdf_path, check_cancelled=None):
+    """Tokenize a PDF's text spans, tagging each word with page and span formatting.
+
+    check_cancelled(), if given, is called for each page and may raise to stop.
+    """
+    tokens = []
+    for page_idx, spans in extract_pages(pdf_path, "spans"):
+        if check_cancelled:
+            check_cancelled()
+        for span in spans:
+            flags = _span_flags(span)
+            for match in TOKEN_RE.finditer(span['text']):
+                tokens.append(Token(match.group(), None, None, page_idx + 1, flags))
+    return tokens
+
+
+def _unique_positions(keys, lo, hi):
+    """Map each key that occurs exactly once in keys[lo:hi] to its position."""
+    seen = {}
+    for i in range(lo, hi):
+        key = keys[i]
+        seen[key] = -1 if key in seen else i
+    return {key: i for key, i in seen.items() if i >= 0}
+
+
+def _longest_increasing(pairs):
+    """Longest chain of pairs increasing in both coordinates (pairs sorted by the first)."""
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_idx.append(n)
+        else:
+            tails[k] = j
+            tail_idx[k] = n
+        prev[n] = tail_idx[k - 1] if k else -1
+
+    chain = []
+    n = tail_idx[-1] if tail_idx else -1
+    while n >= 0:
+        chain.append(pairs[n])
+        n = prev[n]
+    chain.reverse()
+    return chain
+
+
+def _align_gap(a, b, a_lo, a_hi, b_lo, b_hi, matches):
+    """Align a[a_lo:a_hi] with b[b_lo:b_hi], appending matched index pairs in order."""
+    # Common prefix and suffix are matched directly
+    while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+        matches.append((a_lo, b_lo))
+        a_lo += 1
+        b_lo += 1
+    suffix = []
+    while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+        a_hi -= 1
+        b_hi -= 1
+        suffix.append((a_hi, b_hi))
+
+    if a_lo < a_hi and b_lo < b_hi:
+        if (a_hi - a_lo) * (b_hi - b_lo) <= SMALL_GAP_CELLS:
+            matcher = SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                for k in range(size):
+                    matches.append((a_lo + i + k, b_lo + j + k))
+        else:
+            # Patience step: anchor on words unique to both sides, then recurse between anchors
+            unique_a = _unique_positions(a, a_lo, a_hi)
+            unique_b = _unique_positions(b, b_lo, b_hi)
+            pairs = sorted((i, unique_b[key]) for key, i in unique_a.items() if key in unique_b)
+            anchors = _longest_increasing(pairs)
+            # With nothing to anchor on, pairing words by position could match a
+            # paragraph against the wrong page, so the gap is left unaligned
+            if anchors:
+                prev_i, prev_j = a_lo, b_lo
+                for i, j in anchors:
+                    _align_gap(a, b, prev_i, i, prev_j, j, matches)
+                    matches.append((i, j))
+                    prev_i, prev_j = i + 1, j + 1
+                _align_gap(a, b, prev_i, a_hi, prev_j, b_hi, matches)
+
+    matches.extend(reversed(suffix))
+
+
+def align_tokens(word_tokens, pdf_tokens):
+    """Return (word_index, pdf_index) pairs of matching tokens, in order.
+
+    Uses patience-style alignment on words unique to both streams, so documents
+    that mostly agree are aligned in close to linear time. Large stretches with
+    no word unique to both sides stay unaligned rather than being guessed at.
+    """
+    a = [t.key for t in word_tokens]
+    b = [t.key for t in pdf_tokens]
+    matches = []
+    _align_gap(a, b, 0, len(a), 0, len(b), matches)
+    return matches
+
+
+def detect_mismatches(docx_path, pdf_path, compare_flags=DEFAULT_COMPARE_FLAGS,
+                      progress=None, check_cancelled=None):
+    """Find words whose formatting differs between a docx and a PDF.
+
+    Returns (mismatches, stats): mismatch dicts in the mismatches JSON schema,
+    and timing statistics including throughput in tokens per second.
+    progress(index), if given, is called as each of DETECT_STAGES starts;
+    check_cancelled() is called per paragraph and page and may raise to stop.
+    """
+    start = time.perf_counter()
+    if progress:
+        progress(0)
+    word_tokens = extract_word_tokens(docx_path, check_cancelled)
+    if progress:
+        progress(1)
+    pdf_tokens = extract_pdf_tokens(pdf_path, check_cancelled)
+    extracted = time.perf_counter()
+
+    if progress:
+        progress(2)
+    if check_cancelled:
+        check_cancelled()
+    mismatches = []
+    matches = align_tokens(word_tokens, pdf_tokens)
+    for i, j in matches:
+        word_token = word_tokens[i]
+        pdf_token = pdf_tokens[j]
+        if (word_token.flags ^ pdf_token.flags) & compare_flags:
+            mismatches.append({
+                'text': word_token.text,
+                'word_location': {'paragraph': word_token.paragraph, 'offset': word_token.offset},
+                'pdf_location': {'page': pdf_token.page},
+                'word_formatting': flags_to_formatting(word_token.flags),
+                'pdf_formatting': flags_to_formatting(pdf_token.flags),
+            })
+    finished = time.perf_counter()
+
+    token_count = len(word_tokens) + len(pdf_tokens)
+    elapsed = finished - start
+    stats = {
+        'word_tokens': len(word_tokens),
+        'pdf_tokens': len(pdf_tokens),
+        'aligned': len(matches),
+        'mismatches': len(mismatches),
+        'extract_seconds': extracted - start,
+        'align_seconds': finished - extracted,
+        'tokens_per_second': token_count / elapsed if elapsed else 0.0,
+    }
+    return mismatches, stats
+
+
+def write_mismatches(mismatches, output_path):
+    """Write mismatches as a JSON array, or JSON Lines for a .jsonl path."""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        if output_path.endswith('.jsonl'):
+            for mismatch in mismatches:
+                f.write(json.dumps(mismatch) + '\n')
+        else:
+            json.dump(mismatches, f)
+
+
+def main():
+    """
+    Detect formatting mismatches between a Word document and its PDF.
+
+    Usage:
+        python mismatch_detect.py document.docx document.pdf mismatches.json
+    """
+    if len(sys.argv) < 4:
+        print("Usage: python mismatch_detect.py document.docx document.pdf mismatches.json")
+        return
+
+    docx_path, pdf_path, output_path = sys.argv[1:4]
+    mismatches, stats = detect_mismatches(docx_path, pdf_path)
+    write_mismatches(mismatches, output_path)
+
+    print(f"Aligned {stats['aligned']} of {stats['word_tokens']} Word / {stats['pdf_tokens']} PDF tokens")
+    print(f"Found {stats['mismatches']} mismatches, saved to {output_path}")
+    print(f"Throughput: {stats['tokens_per_second']:,.0f} tokens/s "
+          f"(extract {stats['extract_seconds']:.2f}s, align {stats['align_seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import json
+import sys
+
+# Formatting bit flags, packed into one int per side of a mismatch
+BOLD = 1
+ITALIC = 2
+UNDERLINE = 4
+
+FORMATTING_FLAGS = (('bold', BOLD), ('italic', ITALIC), ('underline', UNDERLINE))
+
+READ_CHUNK_SIZE = 1 << 16
+
+
+def formatting_to_flags(formatting):
+    """Pack a formatting dict ({'bold': True, ...}) into bit flags."""
+    flags = 0
+    if formatting:
+        for name, flag in FORMATTING_FLAGS:
+            if formatting.get(name):
+                flags |= flag
+    return flags
+
+
+def flags_to_formatting(flags):
+    """Unpack bit flags into a formatting dict."""
+    return {name: bool(flags & flag) for name, flag in FORMATTING_FLAGS}
+
+
+class Mismatch:
+    """A single Word/PDF formatting mismatch."""
+    __slots__ = ('id', 'text', 'paragraph', 'offset', 'page', 'word_flags', 'pdf_flags')
+
+    def __init__(self, id, text, paragraph, offset, page, word_flags=0, pdf_flags=0):
+        self.id = id
+        self.text = text
+        self.paragraph = paragraph
+        self.offset = offset
+        self.page = page
+        self.word_flags = word_flags
+        self.pdf_flags = pdf_flags
+
+    def to_dict(self):
+        """Return the mismatch in the mismatches JSON schema."""
+        return {
+            'id': self.id,
+            'text': self.text,
+            'word_location': {'paragraph': self.paragraph, 'offset': self.offset},
+            'pdf_location': {'page': self.page},
+            'word_formatting': flags_to_formatting(self.word_flags),
+            'pdf_formatting': flags_to_formatting(self.pdf_flags),
+        }
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators between items
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+            pos += 1
+
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                yield item
+                pos = end
+                # Drop consumed input so the buffer stays around one chunk in size
+                if pos > chunk_size:
+                    buf = buf[pos:]
+                    pos = 0
+                continue
+        elif eof:
+            raise ValueError("Unexpected end of JSON array")
+
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def iter_json_lines(f):
+    """Yield one JSON value per non-blank line."""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_mismatch_file(path):
+    """Yield raw mismatch dicts from a JSON array or JSON Lines file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        # Peek at the first non-whitespace character to pick the reader
+        first = ''
+        while True:
+            first = f.read(1)
+            if not first or not first.isspace():
+                break
+        f.seek(0)
+
+        if first == '[':
+            yield from iter_json_array(f)
+        else:
+            yield from iter_json_lines(f)
+
+
+class MismatchStore:
+    """Compact mismatch collection indexed by Word paragraph and PDF page."""
+
+    def __init__(self):
+        self.records = []
+        self.paragraph_index = {}
+        self.page_index = {}
+
+    @classmethod
+    def load(cls, path):
+        """Build a store from a JSON array or JSON Lines mismatches file."""
+        store = cls()
+        for item in iter_mismatch_file(path):
+            store.add_dict(item)
+        return store
+
+    def add(self, text, paragraph, offset, page, word_flags=0, pdf_flags=0):
+        """Append a mismatch and index it."""
+        record = Mismatch(
+            f"mismatch_{len(self.records)}",
+            sys.intern(text),
+            paragraph,
+            offset,
+            page,
+            word_flags,
+            pdf_flags,
+        )
+        self.records.append(record)
+        self.paragraph_index.setdefault(paragraph, []).append(record)
+        self.page_index.setdefault(page, []).append(record)
+        return record
+
+    def add_dict(self, item):
+        """Append a mismatch given in the mismatches JSON schema."""
+        return self.add(
+            item['text'],
+            item['word_location']['paragraph'],
+            item['word_location']['offset'],
+            item['pdf_location']['page'],
+            formatting_to_flags(item.get('word_formatting')),
+            formatting_to_flags(item.get('pdf_formatting')),
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def by_paragraph(self, paragraph):
+        """Return the mismatches in a Word paragraph."""
+        return self.paragraph_index.get(paragraph, [])
+
+    def by_page(self, page):
+        """Return the mismatches on a PDF page (1-based)."""
+        return self.page_index.get(page, [])
+
+    def pages(self):
+        """Return the PDF pages that have mismatches, in order."""
+        return sorted(self.page_index)
+
+    def write_json(self, f):
+        """Write the mismatches to a text file as a JSON array, one record at a time."""
+        f.write('[')
+        for i, record in enumerate(self.records):
+            if i:
+                f.write(',')
+            f.write(json.dumps(record.to_dict()))
+        f.write(']')
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+
+import fitz  # PyMuPDF
+
+from pdf_pool import open_pdf
+from word_index import sha256_file
+
+# Zoom levels the renderer produces; requests are snapped to the nearest one
+ZOOM_LEVELS = (1.0, 1.5, 2.0, 3.0)
+DEFAULT_ZOOM = 1.5
+
+# Tiles are square, in output pixels
+TILE_SIZE = 512
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pdf_linker', 'tiles')
+DEFAULT_MAX_CACHE_BYTES = 1 << 30
+
+# Check the cache size after writing this fraction of its budget
+EVICT_EVERY_FRACTION = 16
+
+
+def snap_zoom(zoom):
+    """The supported zoom level closest to zoom."""
+    return min(ZOOM_LEVELS, key=lambda level: abs(level - zoom))
+
+
+def evict_tiles(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """Delete the least recently used images until the cache fits in max_bytes."""
+    entries = []
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for name in filenames:
+            if not name.endswith('.png'):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class PageRenderer:
+    """Render PDF pages and page tiles to PNG with PyMuPDF, cached on disk.
+
+    Images are stored under <cache_dir>/<pdf sha256>/<zoom>/, so every viewer
+    of the same PDF content shares them, and evicted least recently used
+    first. Pages are 1-based.
+    """
+
+    def __init__(self, pdf_path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+        self.pdf_path = pdf_path
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dir = os.path.join(cache_dir, sha256_file(pdf_path))
+        self._written = 0
+        self._written_lock = threading.Lock()
+
+    @property
+    def page_count(self):
+        with open_pdf(self.pdf_path) as pdf:
+            return pdf.page_count
+
+    def page_sizes(self):
+        """[width, height] of every page, in the unscaled coordinates of the highlight boxes."""
+        with open_pdf(self.pdf_path) as pdf:
+            return [[round(page.rect.width, 2), round(page.rect.height, 2)] for page in pdf]
+
+    @staticmethod
+    def _page(pdf, page):
+        # Page 0 and below would silently wrap around to the last pages
+        if not 1 <= page <= pdf.page_count:
+            raise IndexError(f"Page {page} is not in the document")
+        return pdf[page - 1]
+
+    def _cached(self, name, zoom, render):
+        """Return the path of a cached image, rendering it on a miss."""
+        zoom_dir = os.path.join(self.dir, f"{zoom:g}")
+        path = os.path.join(zoom_dir, name)
+        if os.path.exists(path):
+            # Mark as recently used for eviction
+            os.utime(path)
+            return path
+
+        # The checkout serializes rendering with other users of the document
+        with open_pdf(self.pdf_path) as pdf:
+            # Another request may have rendered it while we waited
+            if os.path.exists(path):
+                return path
+            pixmap = render(pdf)
+            os.makedirs(zoom_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            pixmap.save(tmp_path, output='png')
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+
+        # Handler threads render concurrently
+        with self._written_lock:
+            self._written += size
+            evict = self._written * EVICT_EVERY_FRACTION > self.max_bytes
+            if evict:
+                self._written = 0
+        if evict:
+            evict_tiles(self.cache_dir, self.max_bytes)
+        return path
+
+    def page_image(self, page, zoom=DEFAULT_ZOOM):
+        """Path of a PNG of a whole page."""
+        zoom = snap_zoom(zoom)
+        return self._cached(
+            f"{page}.png", zoom,
+            lambda pdf: self._page(pdf, page).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False))
+
+    def tile(self, page, zoom, column, row):
+        """Path of a PNG of one TILE_SIZE square of a page; edge tiles are cropped to the page."""
+        zoom = snap_zoom(zoom)
+
+        def render(pdf):
+            pdf_page = self._page(pdf, page)
+            step = TILE_SIZE / zoom
+            origin = pdf_page.rect.tl
+            clip = fitz.Rect(origin.x + column * step, origin.y + row * step,
+                             origin.x + (column + 1) * step, origin.y + (row + 1) * step)
+            clip &= pdf_page.rect
+            if clip.is_empty:
+                raise ValueError(f"Tile {column},{row} is outside page {page}")
+            return pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+
+        return self._cached(f"{page}_{column}_{row}.png", zoom, render)
+
+    def prewarm(self, pages, zooms=(DEFAULT_ZOOM,)):
+        """Render page images for the given pages in a background thread; returns the thread."""
+        def run():
+            for zoom in zooms:
+                for page in pages:
+                    try:
+                        self.page_image(page, zoom)
+                    except Exception as e:
+                        print(f"Error pre-rendering page {page}: {e}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,123 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+import pdf_pool
+from pdf_pool import open_pdf
+
+# Below this many pages, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 64
+MAX_SHARD_PAGES = 32
+
+# Upper bound on extraction workers (None means one per CPU); callers that already
+# run in a pool of their own set this to 1
+MAX_WORKERS = None
+
+# TextPage flags shared by every mode: the PyMuPDF defaults for text, words and blocks
+TEXTPAGE_FLAGS = fitz.TEXTFLAGS_TEXT
+
+
+class PageText:
+    """One page's text layout analysis, run once and shared by every extraction mode.
+
+    MuPDF redoes layout analysis on every page.get_text call; here a single
+    TextPage backs text(), words(), blocks(), dict() and spans().
+    """
+
+    def __init__(self, page, flags=None):
+        self.page = page
+        self.textpage = page.get_textpage(flags=TEXTPAGE_FLAGS if flags is None else flags)
+        self._dict = None
+
+    def text(self):
+        return self.page.get_text('text', textpage=self.textpage)
+
+    def words(self):
+        """(x0, y0, x1, y1, word, block_no, line_no, word_no) tuples."""
+        return self.page.get_text('words', textpage=self.textpage)
+
+    def blocks(self):
+        """(x0, y0, x1, y1, text, block_no, block_type) tuples."""
+        return self.page.get_text('blocks', textpage=self.textpage)
+
+    def dict(self):
+        if self._dict is None:
+            self._dict = self.page.get_text('dict', textpage=self.textpage)
+        return self._dict
+
+    def spans(self):
+        """Text spans in reading order, with their text, font, size, flags, color and bbox."""
+        return [
+            span
+            for block in self.dict()['blocks']
+            for line in block.get('lines', ())
+            for span in line['spans']
+        ]
+
+    def get(self, mode):
+        """Extract one mode ('text', 'words', 'blocks', 'dict' or 'spans'), or a tuple of modes."""
+        if isinstance(mode, tuple):
+            return tuple(getattr(self, m)() for m in mode)
+        return getattr(self, mode)()
+
+
+def iter_pages(pdf_path, mode='text', flags=None, start=0, stop=None):
+    """Yield (page_index, PageText(page, flags).get(mode)) for a range of pages, in this process."""
+    with open_pdf(pdf_path) as pdf:
+        stop = pdf.page_count if stop is None else min(stop, pdf.page_count)
+        for page_index in range(start, stop):
+            yield page_index, PageText(pdf[page_index], flags).get(mode)
+
+
+def _extract_range(pdf_path, mode, flags, start, stop):
+    """Worker: open the PDF in this process and extract one shard of pages."""
+    return [result for _, result in iter_pages(pdf_path, mode, flags, start, stop)]
+
+
+def extract_pages(pdf_path, mode='text', flags=None, workers=None):
+    """Yield (page_index, result) for every page, in page order.
+
+    mode is one of the PageText modes, or a tuple of them to get a tuple of
+    results from a single layout analysis per page.
+
+    Page ranges are sharded across a ProcessPoolExecutor whose workers start
+    with an empty document pool, so each opens the PDF itself; results are merged back in page order as they are
+    consumed. Small PDFs, or workers=1, are extracted in this process.
+    """
+    with open_pdf(pdf_path) as pdf:
+        page_count = pdf.page_count
+
+    workers = workers or MAX_WORKERS or os.cpu_count() or 1
+    if workers == 1 or page_count < PARALLEL_MIN_PAGES:
+        yield from iter_pages(pdf_path, mode, flags)
+        return
+
+    # Several shards per worker keeps the pool busy when pages vary in cost
+    shard_pages = max(1, min(MAX_SHARD_PAGES, page_count // (workers * 4)))
+    shards = iter(range(0, page_count, shard_pages))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=pdf_pool.reset_pool) as pool:
+        pending = deque()
+
+        def submit_next():
+            start = next(shards, None)
+            if start is not None:
+                stop = min(start + shard_pages, page_count)
+                pending.append((start, pool.submit(_extract_range, pdf_path, mode, flags, start, stop)))
+
+        # Bound the shards in flight so results are not buffered far ahead of the consumer
+        for _ in range(workers * 2):
+            submit_next()
+
+        try:
+            while pending:
+                start, future = pending.popleft()
+                results = future.result()
+                submit_next()
+                for offset, result in enumerate(results):
+                    yield start + offset, result
+        finally:
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,48 @@
+from pdf_pool import open_pdf
+
+
+def compute_page_highlights(pdf_path, mismatches, check_cancelled=None):
+    """Locate each mismatch on its PDF page ahead of time.
+
+    Returns {page: [[mismatch_id, x0, y0, x1, y1], ...]} with 1-based page
+    numbers and boxes in unscaled, top-left-origin page coordinates (rotation
+    applied), ready for the viewer to multiply by its render scale. When a text
+    occurs several times on a page, the n-th mismatch with that text is matched
+    to its n-th occurrence. check_cancelled(), if given, is called before
+    each page and may raise to stop.
+    """
+    highlights = {}
+    with open_pdf(pdf_path) as pdf:
+        for page_num in mismatches.pages():
+            if check_cancelled:
+                check_cancelled()
+            if not 1 <= page_num <= pdf.page_count:
+                continue
+
+            page = pdf[page_num - 1]
+            # One layout analysis per page, shared by every search on it
+            textpage = page.get_textpage()
+            rotation = page.rotation_matrix
+
+            occurrences = {}
+            boxes = []
+            for mismatch in mismatches.by_page(page_num):
+                hits = occurrences.get(mismatch.text)
+                if hits is None:
+                    quads = page.search_for(mismatch.text, quads=True, textpage=textpage)
+                    hits = occurrences[mismatch.text] = iter(quads)
+                quad = next(hits, None)
+                if quad is None:
+                    continue
+                rect = quad.rect * rotation
+                boxes.append([
+                    mismatch.id,
+                    round(rect.x0, 2),
+                    round(rect.y0, 2),
+                    round(rect.x1, 2),
+                    round(rect.y1, 2),
+                ])
+
+            if boxes:
+                highlights[page_num] = boxes
+    return highlights
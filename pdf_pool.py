@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+
+from doc_cache import file_key
+
+DEFAULT_MAX_OPEN = 8
+DEFAULT_MAX_BYTES = 1 << 30
+DEFAULT_IDLE_SECONDS = 60
+
+# Rough MuPDF memory use of an open document, relative to its file size
+MEMORY_FACTOR = 2
+
+
+class _Entry:
+    __slots__ = ('key', 'pdf', 'refs', 'last_used', 'weight', 'lock')
+
+    def __init__(self, key, pdf, weight):
+        self.key = key
+        self.pdf = pdf
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.weight = weight
+        # fitz documents are not thread-safe; re-entrant so nested checkouts in one thread work
+        self.lock = threading.RLock()
+
+
+class DocumentPool:
+    """Bounded pool of open fitz documents, keyed by (path, mtime, size).
+
+    Checkouts are reference counted: a document is only closed when nobody
+    holds it, whether because the pool is over max_open or max_bytes (least
+    recently used first), because it sat idle for idle_seconds, or because
+    the file changed and a newer version was opened. A checkout holds the
+    document's lock, so threads sharing a document take turns.
+    """
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN, max_bytes=DEFAULT_MAX_BYTES,
+                 idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @contextmanager
+    def checkout(self, path):
+        """Context manager yielding the open fitz.Document for the current version of path."""
+        entry = self._acquire(path)
+        try:
+            with entry.lock:
+                yield entry.pdf
+        finally:
+            self._release(entry)
+
+    def _acquire(self, path):
+        key = file_key(path)
+        with self._lock:
+            entry = self._checkout_entry(key)
+        if entry is not None:
+            return entry
+
+        # Open outside the lock, so a slow open does not hold up other checkouts
+        pdf = fitz.open(key[0])
+        with self._lock:
+            entry = self._checkout_entry(key)
+            if entry is not None:
+                # Another thread opened it meanwhile
+                pdf.close()
+                return entry
+            # Older versions of this file will never be checked out again
+            for stale in [e for e in self._entries.values() if e.key[0] == key[0] and e.refs == 0]:
+                self._close(stale)
+            entry = self._entries[key] = _Entry(key, pdf, key[2] * MEMORY_FACTOR)
+            self.total_bytes += entry.weight
+            entry.refs += 1
+            self._trim()
+            self._start_reaper()
+        return entry
+
+    def _checkout_entry(self, key):
+        """Take a reference on an already open document; call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.refs += 1
+            self._entries.move_to_end(key)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+            self._trim()
+
+    def _close(self, entry):
+        del self._entries[entry.key]
+        self.total_bytes -= entry.weight
+        entry.pdf.close()
+
+    def _trim(self):
+        # Least recently used first, skipping documents that are checked out
+        for entry in list(self._entries.values()):
+            if len(self._entries) <= self.max_open and self.total_bytes <= self.max_bytes:
+                break
+            if entry.refs == 0:
+                self._close(entry)
+
+    def close_idle(self):
+        """Close documents nobody has checked out for idle_seconds."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.refs == 0 and entry.last_used < cutoff:
+                    self._close(entry)
+
+    def close_all(self):
+        """Close every document that is not checked out."""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if entry.refs == 0:
+                    self._close(entry)
+
+    def _start_reaper(self):
+        if self._reaper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.idle_seconds / 2)
+                self.close_idle()
+
+        self._reaper = threading.Thread(target=run, daemon=True)
+        self._reaper.start()
+
+
+pool = DocumentPool()
+
+
+def reset_pool():
+    """Give this process a fresh, empty pool.
+
+    For forked worker processes: the documents they inherit share file
+    descriptors, and so file offsets, with the parent's, and must not be read.
+    They are dropped without being closed, which would touch the shared state.
+    """
+    global pool
+    pool = DocumentPool()
+
+
+def open_pdf(path):
+    """Check a PDF out of the shared pool: with open_pdf(path) as pdf: ..."""
+    return pool.checkout(path)
@@ -0,0 +1,142 @@
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from doc_cache import cache, cached
+from mismatch_detect import TOKEN_RE, normalize_token
+from word_index import open_word_index
+
+# Words of context kept on each side of a hit
+CONTEXT_WORDS = 8
+
+# Results of the most recent queries kept per index
+MAX_CACHED_QUERIES = 256
+
+
+class PdfSearchIndex:
+    """Positional index of a PDF: normalized term -> positions in its word index.
+
+    Built in one pass over the memory-mapped word index, resolving each
+    distinct string once. A position is a word's index in the word index,
+    which gives its page, place on the page and bounding box.
+
+    close() releases the memory map once no search is using it; searches
+    after that return None, except for queries whose results are still kept.
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf = open_word_index(pdf_path)
+        self.terms = {}
+        string_terms = {}
+        self.word_term = array('i')
+        postings = []
+        for position, string_id in enumerate(self.pdf.string_id):
+            term = string_terms.get(string_id)
+            if term is None:
+                key = normalize_token(self.pdf.string(string_id))
+                term = self.terms.get(key)
+                if term is None:
+                    term = self.terms[key] = len(postings)
+                    postings.append(array('q'))
+                string_terms[string_id] = term
+            self.word_term.append(term)
+            postings[term].append(position)
+        self.postings = postings
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._searches = 0
+        self._closed = False
+
+    def _page_bounds(self, position):
+        """(page index, first position, end position) of the page holding a word."""
+        offsets = self.pdf.page_offsets
+        page = bisect_right(offsets, position) - 1
+        return page, offsets[page], offsets[page + 1]
+
+    def _text(self, start, end):
+        pdf = self.pdf
+        return ' '.join(pdf.string(pdf.string_id[i]) for i in range(start, end))
+
+    def search(self, query):
+        """Every occurrence of a word or phrase, in document order.
+
+        Tokens are compared as normalize_token keys, and a phrase only matches
+        within one page. Each hit is a dict with the 1-based page, the word
+        number on that page, the matched text, CONTEXT_WORDS of text either
+        side and the bounding box in top-left-origin page coordinates. Results
+        of recent queries are kept, so the returned tuple is shared and its hits
+        must not be modified.
+        """
+        terms = tuple(self.terms.get(normalize_token(token)) for token in TOKEN_RE.findall(query))
+        if not terms or None in terms:
+            return ()
+        with self._lock:
+            hits = self._results.get(terms)
+            if hits is not None:
+                self._results.move_to_end(terms)
+                return hits
+            if self._closed:
+                return None
+            self._searches += 1
+
+        try:
+            hits = tuple(self._find(terms))
+        finally:
+            with self._lock:
+                self._searches -= 1
+                release = self._closed and not self._searches
+            if release:
+                self.pdf.close()
+
+        with self._lock:
+            self._results[terms] = hits
+            if len(self._results) > MAX_CACHED_QUERIES:
+                self._results.popitem(last=False)
+        return hits
+
+    def close(self):
+        """Release the word index now, or when the searches running on it finish."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            release = not self._searches
+        if release:
+            self.pdf.close()
+
+    def _find(self, terms):
+        """Yield a hit for each position where the terms occur in sequence on one page."""
+        pdf = self.pdf
+        length = len(terms)
+        for start in self.postings[terms[0]]:
+            page, page_start, page_end = self._page_bounds(start)
+            end = start + length
+            if end > page_end or any(self.word_term[start + k] != terms[k] for k in range(1, length)):
+                continue
+            yield {
+                'page': page + 1,
+                'word': start - page_start,
+                'text': self._text(start, end),
+                'before': self._text(max(page_start, start - CONTEXT_WORDS), start),
+                'after': self._text(end, min(page_end, end + CONTEXT_WORDS)),
+                'bbox': [
+                    round(min(pdf.x0[i] for i in range(start, end)), 2),
+                    round(min(pdf.y0[i] for i in range(start, end)), 2),
+                    round(max(pdf.x1[i] for i in range(start, end)), 2),
+                    round(max(pdf.y1[i] for i in range(start, end)), 2),
+                ],
+            }
+
+
+def search_index(pdf_path):
+    """The PdfSearchIndex for the current version of a PDF, built once and shared.
+
+    The index is closed when the document cache drops it.
+    """
+    return cached('pdf_search', pdf_path, PdfSearchIndex, on_drop=PdfSearchIndex.close)
+
+
+def built_search_index(pdf_path):
+    """The PdfSearchIndex for the current version of a PDF if it is already built, else None."""
+    return cache.peek('pdf_search', pdf_path)
@@ -1,28 +1,19 @@
 import docx
 from docx import Document
-import PyPDF2
 import re
 import os
 from docx.shared import Pt
 from docx.oxml.shared import OxmlElement
 from docx.oxml.ns import qn
+from doc_cache import pdf_page_texts, word_paragraphs
 
 def extract_pdf_text(pdf_path):
     """Extract text from a PDF file."""
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
+    return "".join(pdf_page_texts(pdf_path))
 
 def extract_word_text(docx_path):
     """Extract text from a Word document."""
-    doc = Document(docx_path)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
+    return "".join(para + "\n" for para in word_paragraphs(docx_path))
 
 def find_word_positions(word, text):
     """Find all positions of a word in text."""
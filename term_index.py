@@ -0,0 +1,137 @@
+import html
+from array import array
+from bisect import bisect_right
+
+from mismatch_detect import TOKEN_RE, normalize_token
+from word_index import open_word_index
+
+
+def _postings(term_ids, term_count):
+    """Group token positions by term in one counting pass.
+
+    Returns (starts, positions): the occurrences of term t, in document order,
+    are positions[starts[t]:starts[t + 1]].
+    """
+    starts = array('q', bytes(8 * (term_count + 1)))
+    for term in term_ids:
+        starts[term + 1] += 1
+    for term in range(term_count):
+        starts[term + 1] += starts[term]
+
+    fill = array('q', starts)
+    positions = array('q', bytes(8 * len(term_ids)))
+    for position, term in enumerate(term_ids):
+        positions[fill[term]] = position
+        fill[term] += 1
+    return starts, positions
+
+
+class TermIndex:
+    """Inverted index of the terms shared by a Word document and a PDF.
+
+    Built in one pass over each side: Word tokens are kept as parallel arrays
+    of (term, paragraph, offset, length), PDF tokens as a term per word of the
+    memory-mapped word index, and each side gets a term -> positions postings
+    table. The n-th Word occurrence of a term links to its n-th PDF occurrence
+    (or the last one, if the PDF has fewer).
+    """
+
+    def __init__(self, paragraphs, pdf_path):
+        self.terms = {}
+        self.paragraphs = paragraphs
+
+        # Word side, paragraph by paragraph
+        self.word_term = array('i')
+        self.word_offset = array('i')
+        self.word_length = array('i')
+        self.word_rank = array('i')
+        self.paragraph_starts = array('q', [0])
+        seen = []
+        for text in paragraphs:
+            for match in TOKEN_RE.finditer(text):
+                term = self._term_id(match.group(), seen)
+                self.word_term.append(term)
+                self.word_offset.append(match.start())
+                self.word_length.append(match.end() - match.start())
+                self.word_rank.append(seen[term])
+                seen[term] += 1
+            self.paragraph_starts.append(len(self.word_term))
+
+        # PDF side, straight from the cached word index; terms are resolved once per distinct string
+        self.pdf = open_word_index(pdf_path)
+        string_terms = {}
+        self.pdf_term = array('i')
+        for string_id in self.pdf.string_id:
+            term = string_terms.get(string_id)
+            if term is None:
+                term = string_terms[string_id] = self._term_id(self.pdf.string(string_id), seen)
+            self.pdf_term.append(term)
+
+        self.word_postings = _postings(self.word_term, len(self.terms))
+        self.pdf_postings = _postings(self.pdf_term, len(self.terms))
+
+    def _term_id(self, token, counts):
+        key = normalize_token(token)
+        term = self.terms.get(key)
+        if term is None:
+            term = self.terms[key] = len(self.terms)
+            counts.append(0)
+        return term
+
+    @staticmethod
+    def _occurrences(postings, term):
+        starts, positions = postings
+        return positions[starts[term]:starts[term + 1]]
+
+    def word_occurrences(self, term):
+        """Word token positions of a term, in document order."""
+        return self._occurrences(self.word_postings, term)
+
+    def pdf_occurrences(self, term):
+        """PDF word positions of a term, in document order."""
+        return self._occurrences(self.pdf_postings, term)
+
+    def pdf_location(self, pdf_word):
+        """(page, x0, y0, x1, y1) of a PDF word; pages are 1-based, y grows downwards."""
+        pdf = self.pdf
+        page = bisect_right(pdf.page_offsets, pdf_word)
+        return page, pdf.x0[pdf_word], pdf.y0[pdf_word], pdf.x1[pdf_word], pdf.y1[pdf_word]
+
+    def paragraph_links(self, paragraph):
+        """Yield (offset, length, pdf_word) for each token of a Word paragraph found in the PDF."""
+        starts, positions = self.pdf_postings
+        for i in range(self.paragraph_starts[paragraph], self.paragraph_starts[paragraph + 1]):
+            term = self.word_term[i]
+            first = starts[term]
+            count = starts[term + 1] - first
+            if count:
+                pdf_word = positions[first + min(self.word_rank[i], count - 1)]
+                yield self.word_offset[i], self.word_length[i], pdf_word
+
+    def close(self):
+        """Release the PDF word index."""
+        self.pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def link_paragraph_html(text, links, link_attrs):
+    """Escape a paragraph's text and wrap each linked token in a linked-word span.
+
+    links yields (offset, length, pdf_word) in text order, as from
+    TermIndex.paragraph_links; link_attrs(pdf_word) returns the span's extra
+    attributes.
+    """
+    parts = []
+    pos = 0
+    for offset, length, pdf_word in links:
+        parts.append(html.escape(text[pos:offset]))
+        parts.append(f'<span class="linked-word" {link_attrs(pdf_word)}>'
+                     f'{html.escape(text[offset:offset + length])}</span>')
+        pos = offset + length
+    parts.append(html.escape(text[pos:]))
+    return ''.join(parts)
@@ -0,0 +1,76 @@
+from docx import Document
+from docx.enum.text import WD_COLOR_INDEX
+from docx.oxml.ns import qn
+from docx.oxml.shared import OxmlElement
+
+from docx_stream import run_text, write_highlighted_docx
+from main import WordPdfLinker
+from mismatch_store import MismatchStore
+
+
+def make_docx(path):
+    """A paragraph whose first run holds a page break and a non-breaking hyphen."""
+    doc = Document()
+    para = doc.add_paragraph()
+    run = para.add_run('Bold')
+    page_break = OxmlElement('w:br')
+    page_break.set(qn('w:type'), 'page')
+    run._r.append(page_break)
+    for tag, text in (('w:t', 'up'), ('w:noBreakHyphen', None), ('w:t', 'to date word')):
+        child = OxmlElement(tag)
+        if text:
+            child.text = text
+        run._r.append(child)
+    para.add_run(' tail target')
+    doc.save(path)
+    return para.text
+
+
+def mismatches_for(text, words):
+    store = MismatchStore()
+    for n, word in enumerate(words):
+        store.add_dict({
+            'id': f'mismatch_{n}',
+            'text': word,
+            'word_location': {'paragraph': 0, 'offset': text.index(word)},
+            'pdf_location': {'page': 1},
+            'word_formatting': {'bold': True},
+            'pdf_formatting': {},
+        })
+    return store
+
+
+def highlighted_texts(path):
+    para = Document(path).paragraphs[0]
+    return [run.text for run in para.runs if run.font.highlight_color == WD_COLOR_INDEX.YELLOW]
+
+
+def test_run_text_matches_python_docx(tmp_path):
+    source = str(tmp_path / 'source.docx')
+    make_docx(source)
+    for run in Document(source).paragraphs[0].runs:
+        assert run_text(run._r) == run.text
+
+
+def test_streaming_matches_python_docx_path(tmp_path):
+    source = str(tmp_path / 'source.docx')
+    text = make_docx(source)
+    assert text == 'Boldup-to date word tail target'
+    mismatches = mismatches_for(text, ['date', 'target'])
+
+    streamed = str(tmp_path / 'streamed.docx')
+    write_highlighted_docx(source, streamed, mismatches)
+
+    linker = WordPdfLinker()
+    linker.word_path = source
+    linker.mismatches = mismatches
+    loaded = linker.highlight_word_document(str(tmp_path / 'loaded.docx'))
+
+    assert highlighted_texts(streamed) == highlighted_texts(loaded) == ['date', 'target']
+
+    # The break keeps its type and the hyphen its element, so the text is unchanged
+    para = Document(streamed).paragraphs[0]
+    assert para.text == text
+    breaks = para._p.xpath('.//w:br')
+    assert [br.get(qn('w:type')) for br in breaks] == ['page']
+    assert len(para._p.xpath('.//w:noBreakHyphen')) == 1
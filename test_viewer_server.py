@@ -0,0 +1,53 @@
+import urllib.error
+import urllib.request
+
+import fitz
+import pytest
+
+from mismatch_store import MismatchStore
+from viewer_server import ViewerServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    pdf_path = str(tmp_path / 'document.pdf')
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Range requests")
+    doc.save(pdf_path)
+    doc.close()
+
+    viewer = ViewerServer(pdf_path, '<html></html>', MismatchStore(), {})
+    viewer.start()
+    yield viewer
+    viewer.stop()
+
+
+def fetch(server, range_header):
+    url = server.url.rsplit('/', 1)[0] + '/document.pdf'
+    request = urllib.request.Request(url, headers={'Range': range_header})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_satisfiable_range(server):
+    status, headers, body = fetch(server, 'bytes=0-9')
+    assert status == 206
+    assert len(body) == 10
+    assert headers['Content-Range'].startswith('bytes 0-9/')
+
+
+def test_invalid_range_is_ignored(server):
+    # last-byte-pos before first-byte-pos is not a valid range, so the whole file is sent
+    status, headers, body = fetch(server, 'bytes=5-3')
+    assert status == 200
+    assert len(body) == int(headers['Content-Length']) > 5
+    assert 'Content-Range' not in headers
+
+
+def test_range_past_end_is_unsatisfiable(server):
+    status, headers, _ = fetch(server, 'bytes=100000000-')
+    assert status == 416
+    assert headers['Content-Range'].startswith('bytes */')
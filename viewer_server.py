@@ -0,0 +1,253 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from page_render import DEFAULT_ZOOM, TILE_SIZE, ZOOM_LEVELS, PageRenderer
+
+SEND_CHUNK_SIZE = 1 << 16
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+PAGE_IMAGE_RE = re.compile(r'^/pages/(\d+)\.png$')
+TILE_RE = re.compile(r'^/tiles/([\d.]+)/(\d+)/(\d+)_(\d+)\.png$')
+
+
+class ViewerRequestHandler(BaseHTTPRequestHandler):
+    """Serve the viewer page, its JSON data and the PDF with byte ranges."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def handle_request(self, send_body):
+        path, _, query = self.path.partition('?')
+        try:
+            page_image = PAGE_IMAGE_RE.match(path)
+            tile = TILE_RE.match(path)
+            if page_image:
+                zoom = parse_qs(query).get('zoom', [DEFAULT_ZOOM])[0]
+                self.send_image(lambda renderer: renderer.page_image(int(page_image.group(1)), float(zoom)), send_body)
+            elif tile:
+                self.send_image(lambda renderer: renderer.tile(
+                    int(tile.group(2)), float(tile.group(1)), int(tile.group(3)), int(tile.group(4))), send_body)
+            elif path == '/document.json':
+                self.send_bytes(self.server.viewer.document_json(), 'application/json', send_body)
+            elif path in ('/', '/viewer.html'):
+                self.send_bytes(self.server.viewer.html, 'text/html; charset=utf-8', send_body)
+            elif path == '/mismatches.json':
+                self.send_bytes(self.server.viewer.mismatches_json(), 'application/json', send_body)
+            elif path == '/highlights.json':
+                self.send_bytes(self.server.viewer.highlights_json(), 'application/json', send_body)
+            elif path == '/document.pdf':
+                self.send_pdf(send_body)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            # The browser cancels range requests it no longer needs
+            pass
+
+    def send_image(self, render, send_body):
+        """Send a rendered PNG; rendered images never change, so browsers may keep them."""
+        try:
+            image_path = render(self.server.viewer.renderer)
+        except (IndexError, ValueError):
+            self.send_error(404)
+            return
+        with open(image_path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'max-age=86400, immutable')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def etag_matches(self, etag):
+        if_none_match = self.headers.get('If-None-Match')
+        return if_none_match is not None and etag in [t.strip() for t in if_none_match.split(',')]
+
+    def send_bytes(self, body, content_type, send_body):
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.etag_matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def parse_range(self, size):
+        """Return (start, end) for a single satisfiable Range header, None to ignore it, or False.
+
+        Malformed, multiple and invalid ranges (last before first) are ignored,
+        so the whole file is sent; False means a valid range that lies past the
+        end of the file, which gets 416.
+        """
+        header = self.headers.get('Range')
+        if not header:
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match or not any(match.groups()):
+            # Multiple or malformed ranges: serve the whole file
+            return None
+
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                return False
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0 or size == 0:
+                return False
+            start = max(size - suffix, 0)
+            end = size - 1
+        return start, end
+
+    def send_pdf(self, send_body):
+        pdf_path = self.server.viewer.pdf_path
+        stat = os.stat(pdf_path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+        if self.etag_matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        byte_range = self.parse_range(size)
+        if_range = self.headers.get('If-Range')
+        if byte_range is not None and if_range is not None and if_range.strip() != etag:
+            # The client's copy is stale, so it gets the whole new file
+            byte_range = None
+
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+
+        length = end - start + 1
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        if not send_body:
+            return
+        with open(pdf_path, 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining:
+                chunk = f.read(min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        # Keep request logs out of the GUI status pane
+        pass
+
+
+class ViewerServer:
+    """Local HTTP server for the PDF viewer, serving the PDF straight from its path."""
+
+    def __init__(self, pdf_path, html, mismatches, highlights, host='127.0.0.1', port=0):
+        self.pdf_path = pdf_path
+        self.html = html.encode('utf-8')
+        self.mismatches = mismatches
+        self.highlights = highlights
+        self._mismatches_json = None
+        self._highlights_json = None
+        self._document_json = None
+        self._lock = threading.Lock()
+        self.renderer = PageRenderer(pdf_path)
+
+        self.httpd = ThreadingHTTPServer((host, port), ViewerRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.viewer = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/viewer.html"
+
+    def mismatches_json(self):
+        """Serialize the mismatches once, on first request."""
+        with self._lock:
+            if self._mismatches_json is None:
+                buf = io.StringIO()
+                self.mismatches.write_json(buf)
+                self._mismatches_json = buf.getvalue().encode('utf-8')
+            return self._mismatches_json
+
+    def highlights_json(self):
+        """Serialize the highlight boxes once, on first request."""
+        with self._lock:
+            if self._highlights_json is None:
+                self._highlights_json = json.dumps(self.highlights).encode('utf-8')
+            return self._highlights_json
+
+    def document_json(self):
+        """Page count and rendering parameters for viewers that show server-rendered images."""
+        with self._lock:
+            if self._document_json is None:
+                self._document_json = json.dumps({
+                    'page_count': self.renderer.page_count,
+                    'page_sizes': self.renderer.page_sizes(),
+                    'default_zoom': DEFAULT_ZOOM,
+                    'zoom_levels': ZOOM_LEVELS,
+                    'tile_size': TILE_SIZE,
+                }).encode('utf-8')
+            return self._document_json
+
+    def prewarm(self, pages):
+        """Render the images of pages that viewers are likely to open first."""
+        return self.renderer.prewarm(pages)
+
+    def start(self):
+        """Serve in a background thread and return the viewer URL."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        """Shut the server down and close its socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
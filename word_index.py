@@ -0,0 +1,213 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+from pdf_extract import extract_pages
+
+# On-disk layout: a fixed header followed by 8-byte aligned sections
+#   page_offsets  int64[page_count + 1]   first word of each page
+#   x0, y0, x1, y1  float32[word_count]  one column each
+#   block, line, word_no, string_id  int32[word_count]  one column each
+#   string_offsets  int64[string_count + 1]
+#   strings  UTF-8 bytes
+MAGIC = b'PDFWIDX1'
+HEADER = struct.Struct('=8sIIQQQ')
+HEADER_SIZE = 64
+
+FLOAT_COLUMNS = ('x0', 'y0', 'x1', 'y1')
+INT_COLUMNS = ('block', 'line', 'word_no', 'string_id')
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'pdf_linker', 'word_index')
+DEFAULT_MAX_CACHE_BYTES = 1 << 30
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# (path, mtime, size) -> sha256, so an unchanged file is only hashed once per process
+_hash_memo = {}
+
+
+def sha256_file(path):
+    """Return the SHA-256 hex digest of a file."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _hash_memo.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
+        digest = _hash_memo[key] = h.hexdigest()
+    return digest
+
+
+def remember_sha256(path, digest):
+    """Record a digest computed elsewhere, e.g. while the file was written, so it is not rehashed."""
+    stat = os.stat(path)
+    _hash_memo[(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)] = digest
+
+
+def _padding(length):
+    return b'\0' * (-length % 8)
+
+
+def build_word_index(pdf_path, index_path):
+    """Extract every word of a PDF and write the columnar index file."""
+    page_offsets = array('q', [0])
+    floats = {name: array('f') for name in FLOAT_COLUMNS}
+    ints = {name: array('i') for name in INT_COLUMNS}
+    string_ids = {}
+    strings = []
+
+    page_count = 0
+    for _, words in extract_pages(pdf_path, "words"):
+        page_count += 1
+        for x0, y0, x1, y1, word, block, line, word_no in words:
+            string_id = string_ids.get(word)
+            if string_id is None:
+                string_id = string_ids[word] = len(strings)
+                strings.append(word.encode('utf-8'))
+            floats['x0'].append(x0)
+            floats['y0'].append(y0)
+            floats['x1'].append(x1)
+            floats['y1'].append(y1)
+            ints['block'].append(block)
+            ints['line'].append(line)
+            ints['word_no'].append(word_no)
+            ints['string_id'].append(string_id)
+        page_offsets.append(len(ints['string_id']))
+
+    string_offsets = array('q', [0])
+    for s in strings:
+        string_offsets.append(string_offsets[-1] + len(s))
+    string_bytes = b''.join(strings)
+
+    # Write to a temporary name and rename, so readers never see a partial file
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        header = HEADER.pack(MAGIC, 1, page_count, len(ints['string_id']), len(strings), len(string_bytes))
+        f.write(header + b'\0' * (HEADER_SIZE - len(header)))
+        sections = [page_offsets]
+        sections += [floats[name] for name in FLOAT_COLUMNS]
+        sections += [ints[name] for name in INT_COLUMNS]
+        sections.append(string_offsets)
+        for section in sections:
+            data = section.tobytes()
+            f.write(data + _padding(len(data)))
+        f.write(string_bytes)
+    os.replace(tmp_path, index_path)
+
+
+class WordIndex:
+    """Memory-mapped, read-only view of a PDF word index file."""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        with open(index_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, _version, page_count, word_count, string_count, string_bytes = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a word index file: {index_path}")
+        self.page_count = page_count
+        self.word_count = word_count
+
+        view = self._view = memoryview(self._mmap)
+        pos = HEADER_SIZE
+
+        def take(fmt, count):
+            nonlocal pos
+            size = count * struct.calcsize(fmt)
+            column = view[pos:pos + size].cast(fmt)
+            pos += size + (-size % 8)
+            return column
+
+        self.page_offsets = take('q', page_count + 1)
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, take('f', word_count))
+        for name in INT_COLUMNS:
+            setattr(self, name, take('i', word_count))
+        self.string_offsets = take('q', string_count + 1)
+        self._strings = view[pos:pos + string_bytes]
+        self._string_cache = {}
+
+    def string(self, string_id):
+        """Return the word for a string table id."""
+        word = self._string_cache.get(string_id)
+        if word is None:
+            start = self.string_offsets[string_id]
+            end = self.string_offsets[string_id + 1]
+            word = self._string_cache[string_id] = bytes(self._strings[start:end]).decode('utf-8')
+        return word
+
+    def words(self, page_index):
+        """Return a page's words in the get_text("words") tuple layout (0-based page)."""
+        start = self.page_offsets[page_index]
+        end = self.page_offsets[page_index + 1]
+        return [
+            (
+                self.x0[i], self.y0[i], self.x1[i], self.y1[i],
+                self.string(self.string_id[i]),
+                self.block[i], self.line[i], self.word_no[i],
+            )
+            for i in range(start, end)
+        ]
+
+    def close(self):
+        """Release the memory map."""
+        for name in ('page_offsets', 'string_offsets', '_strings') + FLOAT_COLUMNS + INT_COLUMNS:
+            getattr(self, name).release()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def evict_word_indexes(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES, keep=None):
+    """Delete the least recently used index files until the cache fits in max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.widx'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # Still mapped by another process on Windows; try again next time
+            continue
+        total -= size
+
+
+def open_word_index(pdf_path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """Open the word index for a PDF, building and caching it on first use."""
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, f"{sha256_file(pdf_path)}.widx")
+
+    if os.path.exists(index_path):
+        # Mark as recently used for eviction
+        os.utime(index_path)
+    else:
+        build_word_index(pdf_path, index_path)
+        evict_word_indexes(cache_dir, max_bytes, keep=index_path)
+
+    return WordIndex(index_path)
@@ -0,0 +1,155 @@
+import json
+import os
+
+# Target size of one chunk of Word pane HTML
+CHUNK_BYTES = 1 << 16
+CHUNK_DIR = 'chunks'
+
+# Rough layout figures for sizing a chunk's placeholder before it is loaded
+CHARS_PER_LINE = 80
+LINE_HEIGHT_PX = 19
+PARAGRAPH_MARGIN_PX = 32
+
+# Loader for the Word pane; chunks are script files, since file:// pages cannot fetch()
+WORD_PANE_SCRIPT = """
+const chunkHtml = {};
+const chunkWaiters = {};
+
+// Called by each chunk script
+function wordChunkLoaded(index, html) {
+    chunkHtml[index] = html;
+    (chunkWaiters[index] || []).forEach(resolve => resolve());
+    delete chunkWaiters[index];
+}
+
+function loadChunk(index) {
+    if (chunkHtml[index] !== undefined) {
+        return Promise.resolve();
+    }
+    return new Promise(resolve => {
+        if (!chunkWaiters[index]) {
+            chunkWaiters[index] = [];
+            const script = document.createElement('script');
+            script.src = 'chunks/' + index + '.js';
+            script.onload = () => script.remove();
+            document.head.appendChild(script);
+        }
+        chunkWaiters[index].push(resolve);
+    });
+}
+
+async function showChunk(index) {
+    await loadChunk(index);
+    const element = document.getElementById('chunk-' + index);
+    if (!element.dataset.shown) {
+        element.innerHTML = chunkHtml[index];
+        element.style.minHeight = '';
+        element.dataset.shown = '1';
+    }
+}
+
+// Drop a far-away chunk's DOM, keeping its height so the scroll position holds
+function hideChunk(index) {
+    const element = document.getElementById('chunk-' + index);
+    if (element.dataset.shown) {
+        element.style.minHeight = element.offsetHeight + 'px';
+        element.innerHTML = '';
+        delete element.dataset.shown;
+    }
+}
+
+// Load only the chunk holding a paragraph, then scroll to it
+async function goToParagraph(paragraph) {
+    let lo = 0;
+    let hi = wordChunks.length - 1;
+    while (lo < hi) {
+        const mid = (lo + hi + 1) >> 1;
+        if (wordChunks[mid][0] <= paragraph) {
+            lo = mid;
+        } else {
+            hi = mid - 1;
+        }
+    }
+    await showChunk(lo);
+    const target = document.getElementById('p' + paragraph);
+    if (target) {
+        target.scrollIntoView({ block: 'start' });
+    }
+}
+
+function goToHashParagraph() {
+    const match = location.hash.match(/^#p=(\\d+)$/);
+    if (match) {
+        goToParagraph(Number(match[1]));
+    }
+}
+
+function initWordPane() {
+    const observer = new IntersectionObserver(entries => {
+        for (const entry of entries) {
+            const index = Number(entry.target.dataset.chunk);
+            if (entry.isIntersecting) {
+                showChunk(index);
+            } else {
+                hideChunk(index);
+            }
+        }
+    }, { root: document.querySelector('.word-section'), rootMargin: '200% 0px' });
+    document.querySelectorAll('.word-chunk').forEach(element => observer.observe(element));
+
+    // Deep links: viewer.html#p=<paragraph>
+    window.addEventListener('hashchange', goToHashParagraph);
+    goToHashParagraph();
+}
+"""
+
+
+def _estimated_height(text):
+    lines = max(1, -(-len(text) // CHARS_PER_LINE))
+    return lines * LINE_HEIGHT_PX + PARAGRAPH_MARGIN_PX
+
+
+def write_word_chunks(viewer_dir, paragraphs, paragraph_html):
+    """Write the Word pane as chunk scripts under viewer_dir/chunks.
+
+    paragraph_html(index, text) returns the inner HTML of one paragraph.
+    Returns the chunk index: [first_paragraph, paragraph_count, estimated_height_px]
+    per chunk.
+    """
+    chunk_dir = os.path.join(viewer_dir, CHUNK_DIR)
+    os.makedirs(chunk_dir, exist_ok=True)
+    chunks = []
+    parts = []
+    size = 0
+    first = 0
+    height = 0
+
+    def flush(end):
+        with open(os.path.join(chunk_dir, f"{len(chunks)}.js"), 'w', encoding='utf-8') as f:
+            f.write(f"wordChunkLoaded({len(chunks)}, {json.dumps(''.join(parts))});\n")
+        chunks.append([first, end - first, height])
+
+    for i, text in enumerate(paragraphs):
+        part = f'<p id="p{i}">{paragraph_html(i, text)}</p>'
+        parts.append(part)
+        size += len(part)
+        height += _estimated_height(text)
+        if size >= CHUNK_BYTES:
+            flush(i + 1)
+            parts, size, first, height = [], 0, i + 1, 0
+    if parts or not chunks:
+        flush(len(paragraphs))
+    return chunks
+
+
+def word_pane_placeholders(chunks):
+    """Placeholder divs for the chunks, sized by their estimated heights."""
+    return ''.join(
+        f'<div class="word-chunk" id="chunk-{n}" data-chunk="{n}" style="min-height: {height}px"></div>'
+        for n, (_, _, height) in enumerate(chunks)
+    )
+
+
+def word_pane_script(chunks):
+    """The Word pane loader with the chunk index inlined; call initWordPane() once the page is built."""
+    return f"const wordChunks = {json.dumps(chunks)};\n{WORD_PANE_SCRIPT}"